@@ -0,0 +1,156 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+
+# Global constants
+ATTENDANCE_DB = 'attendance.db'  # Append-only punch log; the source of truth
+EXCEL_FILE = 'attendance.xlsx'  # Export only, regenerated from the log on demand
+ATTENDANCE_HEADER = ["Employee Name", "Shift Start", "Break Start", "Break End", "Shift End"]
+ACTION_COLUMNS = [("Clock In", 2), ("Break Start", 3), ("Break End", 4), ("Shift End", 5)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS punches (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    employee TEXT NOT NULL,
+    action TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS punches_by_day ON punches (day, employee);
+"""
+
+# Every punch is one row appended to a SQLite table in WAL mode, so recording
+# a punch costs the same on day one as after years of history. Rows are never
+# updated or deleted; a day's sheet is just a view over its rows.
+class AttendanceLog:
+    def __init__(self, path=ATTENDANCE_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")  # fsync the WAL on every commit
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        # {employee: {action: timestamp}} for the current day, loaded once and
+        # kept up to date by append, so a punch never scans the day's rows
+        self.today = {"day": None, "employees": {}}
+
+    def close(self):
+        self.connection.close()
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM punches").fetchone()[0]
+
+    # The day index, rebuilt from the log only when the day changes; call with the lock held
+    def _day_index(self, day):
+        if self.today["day"] != day:
+            employees = {}
+            for employee, action, timestamp in self.connection.execute(
+                    "SELECT employee, action, timestamp FROM punches WHERE day = ? ORDER BY id", (day,)):
+                employees.setdefault(employee, {})[action] = timestamp
+            self.today = {"day": day, "employees": employees}
+        return self.today["employees"]
+
+    # {action: timestamp} already recorded for one employee on one day; a
+    # dictionary lookup for the current day
+    def employee_actions(self, day, employee):
+        with self.lock:
+            return dict(self._day_index(day).get(employee, {}))
+
+    # Build the index for a day ahead of its first punch
+    def load_day(self, day):
+        with self.lock:
+            self._day_index(day)
+
+    # Append (day, employee, action, timestamp) punches in one committed transaction
+    def append(self, punches):
+        with self.lock:
+            with self.connection:
+                self.connection.executemany("INSERT INTO punches (day, employee, action, timestamp) "
+                                            "VALUES (?, ?, ?, ?)", punches)
+
+            # Only after the commit, so the index never shows a punch that isn't on disk
+            for day, employee, action, timestamp in punches:
+                if day == self.today["day"]:
+                    self.today["employees"].setdefault(employee, {})[action] = timestamp
+
+    def days(self):
+        with self.lock:
+            return [day for day, in self.connection.execute("SELECT DISTINCT day FROM punches ORDER BY day")]
+
+    # One day as sheet rows: [name, shift start, break start, break end, shift end],
+    # employees in order of their first punch that day
+    def day_rows(self, day):
+        with self.lock:
+            punches = self.connection.execute("SELECT employee, action, timestamp FROM punches WHERE day = ? "
+                                              "ORDER BY id", (day,)).fetchall()
+
+        columns = dict(ACTION_COLUMNS)
+        rows = {}
+        for employee, action, timestamp in punches:
+            row = rows.setdefault(employee, [employee, None, None, None, None])
+            row[columns[action] - 1] = timestamp
+        return list(rows.values())
+
+    # One-off import of the per-day sheets of an existing attendance workbook
+    def import_workbook(self, excel_path=EXCEL_FILE):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(excel_path, read_only=True)
+        punches = []
+        for ws in wb.worksheets:
+            try:
+                datetime.datetime.strptime(ws.title, '%Y-%m-%d')
+            except ValueError:
+                continue  # Not a day sheet
+
+            for row in ws.iter_rows(min_row=2, max_col=5, values_only=True):
+                if not row or row[0] is None:
+                    continue
+                day_punches = [(ws.title, row[0], action, str(row[column - 1]))
+                               for action, column in ACTION_COLUMNS if len(row) >= column and row[column - 1] is not None]
+                punches.extend(sorted(day_punches, key=lambda punch: punch[3]))
+        wb.close()
+
+        self.append(punches)
+        return len(punches)
+
+    # Write the log out as the familiar workbook, one sheet per day. The file is
+    # written to a temporary name first so a half-written export is never left behind.
+    def export_workbook(self, excel_path=EXCEL_FILE, days=None):
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        for day in days or self.days():
+            ws = wb.create_sheet(day)
+            ws.append(ATTENDANCE_HEADER)
+            for row in self.day_rows(day):
+                ws.append(row)
+        if not wb.worksheets:
+            wb.create_sheet(datetime.datetime.now().strftime('%Y-%m-%d')).append(ATTENDANCE_HEADER)
+
+        temp_path = excel_path + '.tmp.xlsx'
+        wb.save(temp_path)
+        os.replace(temp_path, excel_path)
+
+# Open the log, importing the old attendance workbook the first time
+def open_attendance_log(path=ATTENDANCE_DB, excel_path=EXCEL_FILE):
+    log = AttendanceLog(path)
+    if log.count() == 0 and os.path.exists(excel_path):
+        log.import_workbook(excel_path)
+    return log
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export the attendance log to an Excel workbook.")
+    parser.add_argument("-o", "--output", default=EXCEL_FILE, help="Workbook to write")
+    parser.add_argument("--days", nargs="*", help="Only these days (YYYY-MM-DD); default is every day")
+    parser.add_argument("--db", default=ATTENDANCE_DB)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    attendance_log = AttendanceLog(args.db)
+    attendance_log.export_workbook(args.output, args.days)
+    print(f"Exported {len(args.days or attendance_log.days())} days to {args.output}")
@@ -0,0 +1,155 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+import cv2
+from face_gallery import load_gallery
+from face_tracker import FaceTracker
+from recognition_pipeline import recognize_faces
+
+# Global constants
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_CHUNK_FRAMES = 3000  # Frames per work item when a video is split across processes
+IMAGE_CHUNK_SIZE = 50  # Images per work item
+RESULT_COLUMNS = ["Source", "Frame", "Seconds", "Track", "Employee Name", "Distance", "Top", "Right", "Bottom", "Left"]
+
+# Per-process state, loaded once by init_worker
+worker = {}
+
+def init_worker(detection_mode, detection_scale, tolerance):
+    worker["gallery"] = load_gallery()
+    worker["face_cascade"] = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    worker["detection_mode"] = detection_mode
+    worker["detection_scale"] = detection_scale
+    worker["tolerance"] = tolerance
+
+# Result rows for every recognised face in the given tracks
+def track_rows(source, frame_index, seconds, tracks):
+    rows = []
+    for track in tracks:
+        if track.name is not None:
+            top, right, bottom, left = track.location
+            rows.append([source, frame_index, f"{seconds:.3f}", track.track_id, track.name,
+                         f"{track.distance:.4f}", top, right, bottom, left])
+    return rows
+
+def recognise(frame, tracker):
+    return recognize_faces(frame, worker["face_cascade"], worker["gallery"], tracker,
+                           worker["detection_mode"], worker["detection_scale"], worker["tolerance"])
+
+# Process frames [start, end) of a video, decoding only every stride-th frame;
+# end=None reads to the end of the stream. Returns (result rows, frames
+# actually decoded), which is short of the plan if the video ends early or a
+# frame cannot be read.
+def process_video_chunk(job):
+    video_path, start, end, stride = job
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    tracker = FaceTracker()  # Consecutive sampled frames form a stream, like the live loop
+    rows = []
+    decoded = 0
+    for frame_index in range(start, end) if end is not None else itertools.count(start):
+        # grab() skips a frame without the cost of decoding it
+        if (frame_index - start) % stride:
+            if not cap.grab():
+                break
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded += 1
+        rows.extend(track_rows(video_path, frame_index, frame_index / fps, recognise(frame, tracker)))
+
+    cap.release()
+    return rows, decoded
+
+# Process a list of still images, each treated independently
+def process_image_chunk(job):
+    rows = []
+    decoded = 0
+    for image_path in job:
+        frame = cv2.imread(image_path)
+        if frame is not None:
+            decoded += 1
+            rows.extend(track_rows(image_path, 0, 0.0, recognise(frame, None)))
+    return rows, decoded
+
+# Split every input into work items for the process pool. Videos that don't
+# report a frame count (some containers and streams) can't be split, so they
+# are read from start to end as a single work item.
+def build_jobs(inputs, stride):
+    video_jobs = []
+    image_jobs = []
+
+    for path in inputs:
+        if os.path.isdir(path):
+            images = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+            if not images:
+                print(f"Skipping {path}: no images found")
+            image_jobs.extend(images[i:i + IMAGE_CHUNK_SIZE] for i in range(0, len(images), IMAGE_CHUNK_SIZE))
+        else:
+            cap = cv2.VideoCapture(path)
+            opened = cap.isOpened()
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            if not opened:
+                print(f"Skipping {path}: cannot open as a video")
+            elif frame_count <= 0:
+                print(f"{path}: no frame count reported, reading it sequentially in one process")
+                video_jobs.append((path, 0, None, stride))
+            else:
+                for start in range(0, frame_count, VIDEO_CHUNK_FRAMES):
+                    video_jobs.append((path, start, min(start + VIDEO_CHUNK_FRAMES, frame_count), stride))
+
+    return video_jobs, image_jobs
+
+def run_batch(args):
+    video_jobs, image_jobs = build_jobs(args.inputs, args.stride)
+    if not video_jobs and not image_jobs:
+        raise SystemExit("Nothing to process: none of the inputs gave any video frames or images")
+    start_time = time.perf_counter()
+    frames_processed = 0
+
+    with open(args.output, 'w', newline='', encoding='utf-8') as f, \
+            multiprocessing.Pool(args.workers, init_worker,
+                                 (args.detection_mode, args.detection_scale, args.tolerance)) as pool:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS)
+
+        # Chunk results arrive in input order so the file reads chronologically
+        video_results = pool.imap(process_video_chunk, video_jobs)
+        image_results = pool.imap(process_image_chunk, image_jobs)
+        video_frames = dict.fromkeys((job[0] for job in video_jobs), 0)
+        for job, (rows, frames) in zip(video_jobs, video_results):
+            writer.writerows(rows)
+            frames_processed += frames
+            video_frames[job[0]] += frames
+        for rows, frames in image_results:
+            writer.writerows(rows)
+            frames_processed += frames
+
+    for video_path, frames in video_frames.items():
+        if not frames:
+            print(f"Warning: no frames could be decoded from {video_path}")
+    elapsed = time.perf_counter() - start_time
+    print(f"Processed {frames_processed} frames in {elapsed:.1f}s "
+          f"({frames_processed / max(elapsed, 1e-9):.1f} frames/s); results in {args.output}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run face recognition over video files and image folders without a GUI.")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or directories of images")
+    parser.add_argument("-o", "--output", default="recognition_results.csv", help="CSV file to write results to")
+    parser.add_argument("--stride", type=int, default=5, help="Process every Nth video frame")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--detection-mode", default="cascade_roi", choices=["hog", "cascade", "cascade_roi"])
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    run_batch(parse_args())
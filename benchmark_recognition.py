@@ -0,0 +1,211 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import model_registry as face_models
+import numpy as np
+from employee_data import IMAGE_DIR
+from face_gallery import FaceGallery
+from face_tracker import FaceTracker
+from recognition_pipeline import recognize_faces
+
+# Global constants
+GALLERY_SIZES = [10, 100, 1000, 10000, 100000]
+STAGES = ["haar", "hog", "locate", "encode", "match", "total"]
+PERCENTILES = [50, 90, 99]
+STORAGE_MODES = ["float32", "float16", "int8"]
+PROBE_NOISE = 0.03  # Per-dimension noise that turns a gallery encoding into a "second photo"
+
+# Replays stored photos and recorded video through the same detect -> encode -> match
+# path as open_camera_for_recognition and reports per-stage latency, throughput
+# and memory for a range of gallery sizes
+
+# Load every image in a directory as a BGR frame
+def load_image_frames(image_dir):
+    frames = []
+    for filename in sorted(os.listdir(image_dir)):
+        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            frame = cv2.imread(os.path.join(image_dir, filename))
+            if frame is not None:
+                frames.append(frame)
+    return frames
+
+# Read up to max_frames frames from a video file
+def load_video_frames(video_path, max_frames):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+# Real encodings of the photos, so at least part of every gallery is genuine
+def encode_reference_faces(frames):
+    encodings = []
+    for frame in frames:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        encodings.extend(face_models.face_encodings(rgb_frame))
+    return np.array(encodings)
+
+# Pad the real encodings with synthetic ones drawn from the same per-dimension
+# distribution until the gallery has `size` rows
+def synthetic_encodings(reference_encodings, size, seed=0):
+    rng = np.random.default_rng(seed)
+    real = reference_encodings[:size]
+    names = [f"employee{i + 1}" for i in range(len(real))]
+
+    synthetic_count = size - len(real)
+    if synthetic_count > 0:
+        mean = reference_encodings.mean(axis=0) if len(reference_encodings) else np.zeros(128)
+        std = reference_encodings.std(axis=0) if len(reference_encodings) > 1 else np.full(128, 0.1)
+        synthetic = rng.normal(mean, std, size=(synthetic_count, 128))
+        real = np.vstack([real, synthetic]) if len(real) else synthetic
+        names += [f"synthetic{i + 1}" for i in range(synthetic_count)]
+
+    return real, names
+
+# Quantized galleries re-rank from a memory-mapped file of exact encodings, as
+# load_gallery does with the encoding store, so the exact copy isn't counted as
+# gallery memory
+def build_synthetic_gallery(reference_encodings, size, storage="float32", seed=0, exact_dir=None):
+    encodings, names = synthetic_encodings(reference_encodings, size, seed)
+    if storage == "float32":
+        return FaceGallery.from_encodings(encodings, names)
+
+    exact_path = os.path.join(exact_dir or tempfile.gettempdir(), f"exact_{size}_{seed}.bin")
+    exact_source = np.memmap(exact_path, dtype=np.float64, mode='w+', shape=encodings.shape)
+    exact_source[:] = encodings
+    exact_source.flush()
+    del encodings
+    return FaceGallery.from_encodings(exact_source, names, storage, exact_source=exact_source)
+
+# Compare float16/int8 storage with float32 on the tolerance=0.6 match decision.
+# Genuine probes are noisy copies of gallery rows; impostors are drawn from the
+# same distribution but are not enrolled.
+def quantization_report(reference_encodings, size, probes=500, tolerance=0.6, seed=1):
+    rng = np.random.default_rng(seed)
+    encodings, names = synthetic_encodings(reference_encodings, size)
+    genuine = encodings[rng.integers(0, size, probes)] + rng.normal(0, PROBE_NOISE, size=(probes, 128))
+    impostors = rng.normal(encodings.mean(axis=0), encodings.std(axis=0) + 1e-3, size=(probes, 128))
+    probe_set = np.vstack([genuine, impostors])
+
+    reference = FaceGallery.from_encodings(encodings, names)
+    exact = reference.match(probe_set, tolerance=tolerance)
+    exact_distances = reference.distances(probe_set[:50])
+    print(f"\nQuantization at gallery size {size}, {len(probe_set)} probes, tolerance {tolerance}")
+
+    for storage in STORAGE_MODES[1:]:
+        gallery = FaceGallery.from_encodings(encodings, names, storage, exact_source=encodings)
+        quantized = gallery.match(probe_set, tolerance=tolerance)
+        agree = sum((a[0][0] if a else None) == (b[0][0] if b else None) for a, b in zip(exact, quantized))
+
+        # Error of the raw quantized distance, before the exact re-rank
+        raw_error = np.abs(gallery.distances(probe_set[:50]) - exact_distances).max()
+        print(f"  {storage:<7} {gallery.memory_bytes() / 1024 / 1024:7.1f} MiB, "
+              f"decision agreement {100.0 * agree / len(probe_set):.2f}%, "
+              f"max raw distance error {raw_error:.4f}")
+
+# Run every frame through recognize_faces and collect per-stage timings (seconds)
+def replay(frames, face_cascade, gallery, detection_mode, detection_scale, track):
+    samples = {stage: [] for stage in STAGES}
+    tracker = FaceTracker() if track else None
+    recognised = 0
+
+    for frame in frames:
+        stage_times = {}
+        start = time.perf_counter()
+        tracks = recognize_faces(frame, face_cascade, gallery, tracker, detection_mode, detection_scale,
+                                 stage_times=stage_times)
+        stage_times["total"] = time.perf_counter() - start
+
+        recognised += sum(1 for t in tracks if t.name is not None)
+        for stage in STAGES:
+            if stage in stage_times:
+                samples[stage].append(stage_times[stage])
+
+    return samples, recognised
+
+def format_percentiles(values):
+    if not values:
+        return "   n/a"
+    return " ".join(f"p{p}={1000 * np.percentile(values, p):7.2f}ms" for p in PERCENTILES)
+
+def run_benchmark(args):
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    sources = [("images", load_image_frames(args.images))] if args.images else []
+    for video_path in args.videos:
+        sources.append((os.path.basename(video_path), load_video_frames(video_path, args.max_frames)))
+
+    image_frames = sources[0][1] if sources and args.images else []
+    reference_encodings = encode_reference_faces(image_frames)
+    print(f"Encoded {len(reference_encodings)} reference faces from {args.images}")
+
+    exact_dir = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+    gallery = None
+    for size in args.gallery_sizes:
+        tracemalloc.start()
+        gallery = build_synthetic_gallery(reference_encodings, size, args.storage, exact_dir=exact_dir.name)
+        if args.ann:
+            gallery.build_index(n_probe=args.ann_probes)
+        gallery_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f"\nGallery size {size} ({gallery_memory / 1024 / 1024:.1f} MiB in RAM, "
+              f"{gallery.memory_bytes() / 1024 / 1024:.1f} MiB of encodings, {args.storage}"
+              f"{', IVF index' if args.ann else ''})")
+
+        if args.quantization_report:
+            quantization_report(reference_encodings, size)
+
+        for source_name, frames in sources:
+            if not frames:
+                continue
+
+            # Video is a continuous stream, so it keeps a tracker like the live loop
+            track = source_name != "images"
+            start = time.perf_counter()
+            samples, recognised = replay(frames, face_cascade, gallery, args.detection_mode,
+                                         args.detection_scale, track)
+            elapsed = time.perf_counter() - start
+
+            print(f"  {source_name}: {len(frames)} frames, {len(frames) / elapsed:.1f} frames/s, "
+                  f"{recognised} faces recognised")
+            for stage in STAGES:
+                if samples[stage]:
+                    print(f"    {stage:<7} {format_percentiles(samples[stage])}")
+
+    del gallery  # Release the memory maps before their files are removed
+    exact_dir.cleanup()
+
+    if sys.platform != "win32":
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        peak_mib = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+        print(f"\nPeak RSS: {peak_mib:.1f} MiB")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the face recognition pipeline offline.")
+    parser.add_argument("--images", default=IMAGE_DIR, help="Directory of photos to replay")
+    parser.add_argument("--videos", nargs="*", default=[], help="Recorded video files to replay")
+    parser.add_argument("--max-frames", type=int, default=300, help="Frames read from each video")
+    parser.add_argument("--gallery-sizes", type=lambda s: [int(n) for n in s.split(",")], default=GALLERY_SIZES,
+                        help="Comma-separated gallery sizes, e.g. 10,1000,100000")
+    parser.add_argument("--detection-mode", default="cascade_roi", choices=["hog", "cascade", "cascade_roi"])
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument("--ann", action="store_true", help="Match through an IVF index")
+    parser.add_argument("--ann-probes", type=int, default=8)
+    parser.add_argument("--storage", default="float32", choices=STORAGE_MODES, help="Gallery storage precision")
+    parser.add_argument("--quantization-report", action="store_true",
+                        help="Compare float16/int8 match decisions with float32 at each gallery size")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    run_benchmark(parse_args())
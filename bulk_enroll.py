@@ -0,0 +1,141 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+import cv2
+import model_registry as face_models
+from openpyxl import Workbook, load_workbook
+from employee_data import EMPLOYEE_DATA_FILE, EMPLOYEE_DATA_HEADER
+from encoding_store import append_encodings
+from face_crop_store import largest_face, save_face_crop
+from face_gallery import DUPLICATE_TOLERANCE, load_gallery
+
+# Global constants
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Read a CSV of Filename, First Name, Last Name into {filename: (first, last)}
+def load_name_mapping(mapping_path):
+    mapping = {}
+    with open(mapping_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            mapping[row["Filename"]] = (row["First Name"].strip(), row["Last Name"].strip())
+    return mapping
+
+# Fall back to the First_Last_<timestamp>.jpg names register_new_employee writes
+def names_from_filename(filename):
+    parts = os.path.splitext(filename)[0].split('_')
+    if len(parts) < 2:
+        return None
+    return parts[0], parts[1]
+
+# Encode the largest face in one photo; runs in a worker process.
+# Group photos aside, the enrollee is the biggest face in the picture.
+def encode_image(image_path):
+    image = cv2.imread(image_path)
+    face_location = largest_face(image) if image is not None else None
+    if face_location is None:
+        return image_path, None, None
+
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image_path, face_models.face_encodings(rgb_image, [face_location])[0], face_location
+
+# Save the aligned crop of an enrolled photo's face; runs in a worker process
+def save_crop(job):
+    image_path, face_location = job
+    return image_path, save_face_crop(cv2.imread(image_path), face_location)
+
+# Flag photos whose face is already enrolled, or appears earlier in this batch;
+# returns the entries to enroll
+def check_duplicates(encoded, names, skip_duplicates=False):
+    gallery = load_gallery()
+    kept = []
+    for image_path, face_encoding in encoded:
+        full_name = f"{names[image_path][0]} {names[image_path][1]}"
+        matches = gallery.match([face_encoding], tolerance=DUPLICATE_TOLERANCE)[0]
+        if matches:
+            existing_name, distance = matches[0]
+            print(f"{'Skipping' if skip_duplicates else 'Warning'} {image_path}: {full_name} looks like "
+                  f"already enrolled {existing_name} (distance {distance:.2f})")
+            if skip_duplicates:
+                continue
+        gallery.add(face_encoding, full_name)
+        kept.append((image_path, face_encoding))
+    return kept
+
+def bulk_enroll(image_dir, mapping_path=None, workers=None, skip_duplicates=False):
+    mapping = load_name_mapping(mapping_path) if mapping_path else {}
+
+    jobs = []
+    names = {}
+    for filename in sorted(os.listdir(image_dir)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        name = mapping.get(filename) or (None if mapping else names_from_filename(filename))
+        if name is None:
+            print(f"Skipping {filename}: no name for this photo")
+            continue
+        image_path = os.path.join(image_dir, filename)
+        names[image_path] = name
+        jobs.append(image_path)
+
+    start_time = time.perf_counter()
+    encoded = []
+    face_locations = {}
+    with multiprocessing.Pool(workers) as pool:
+        for done, (image_path, face_encoding, face_location) in enumerate(pool.imap(encode_image, jobs, chunksize=8), 1):
+            if face_encoding is None:
+                print(f"Skipping {image_path}: no face found")
+            else:
+                encoded.append((image_path, face_encoding))
+                face_locations[image_path] = face_location
+            if done % 100 == 0:
+                print(f"Encoded {done}/{len(jobs)} photos")
+
+        encoded = check_duplicates(encoded, names, skip_duplicates)
+
+        if not encoded:
+            print("No faces enrolled")
+            return 0
+
+        # Crops only for the photos being enrolled, so skipped duplicates leave nothing behind
+        crop_paths = dict(pool.imap(save_crop, [(image_path, face_locations[image_path]) for image_path, _ in encoded],
+                                    chunksize=8))
+
+    # One append to the encoding store and one save of employee data Excel for the whole batch
+    encoding_ids = append_encodings([face_encoding for _, face_encoding in encoded],
+                                    [f"{names[image_path][0]} {names[image_path][1]}" for image_path, _ in encoded],
+                                    model_versions=[face_models.model_version()] * len(encoded),
+                                    sources=[crop_paths[image_path] for image_path, _ in encoded])
+
+    if os.path.exists(EMPLOYEE_DATA_FILE):
+        wb = load_workbook(EMPLOYEE_DATA_FILE)
+        ws = wb.active
+    else:
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "EmployeeData"
+        ws.append(EMPLOYEE_DATA_HEADER)
+
+    ws.cell(row=1, column=5).value = EMPLOYEE_DATA_HEADER[4]  # Older files only have four columns
+    for (image_path, _), encoding_id in zip(encoded, encoding_ids):
+        first_name, last_name = names[image_path]
+        ws.append([first_name, last_name, crop_paths[image_path], encoding_id, image_path])
+    wb.save(EMPLOYEE_DATA_FILE)
+
+    print(f"Enrolled {len(encoded)} of {len(jobs)} photos in {time.perf_counter() - start_time:.1f}s")
+    return len(encoded)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Enroll every employee photo in a folder in one go.")
+    parser.add_argument("image_dir", help="Folder of employee photos, e.g. employee_images/")
+    parser.add_argument("--mapping", help="CSV with Filename, First Name, Last Name columns; "
+                                          "without it names come from First_Last_*.jpg filenames")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="Don't enroll photos whose face is already in the gallery")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    bulk_enroll(args.image_dir, args.mapping, args.workers, args.skip_duplicates)
@@ -0,0 +1,114 @@
+import collections
+import threading
+import time
+from stage_timing import metrics
+
+# Global constants
+FRAME_BUFFER_SIZE = 2  # Frames kept by the capture thread; older ones are dropped
+FRAME_WAIT_TIMEOUT = 2.0  # Seconds to wait for a new frame before giving up
+TARGET_PREVIEW_FPS = 20.0
+MAX_RECOGNITION_LATENCY = 0.5  # Seconds a face may wait for the next processing pass
+PROCESSING_SHARE = 0.5  # Fraction of wall time the processing pass may use
+IDLE_AFTER_SECONDS = 3.0  # Back off after this long without a face
+IDLE_PROCESS_INTERVAL = 0.3  # Gap between passes while idle
+COST_SMOOTHING = 0.2  # Weight of the newest sample in the running cost average
+
+# Reads the camera on its own thread and keeps only the newest few frames, so
+# slow detection/encoding never works on a backed-up, stale camera buffer
+class FrameGrabber:
+    def __init__(self, cap, buffer_size=FRAME_BUFFER_SIZE):
+        self.cap = cap
+        self.frames = collections.deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.running = False
+        self.failed = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name="FrameGrabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def _capture_loop(self):
+        while self.running:
+            # Timed here rather than around read(), which mostly waits for the next frame
+            with metrics.timer("camera_read"):
+                ret, frame = self.cap.read()
+
+            with self.condition:
+                if not ret:
+                    self.failed = True
+                    self.running = False
+                    self.condition.notify_all()
+                    break
+
+                if len(self.frames) == self.frames.maxlen:
+                    self.frames_dropped += 1
+                self.frames.append(frame)
+                self.frames_captured += 1
+                self.condition.notify_all()
+
+    # Same contract as cap.read(): wait for the freshest frame and discard the rest
+    def read(self, timeout=FRAME_WAIT_TIMEOUT):
+        with self.condition:
+            if not self.frames and not self.failed:
+                self.condition.wait_for(lambda: self.frames or self.failed, timeout)
+
+            if not self.frames:
+                return False, None
+
+            frame = self.frames.pop()
+            self.frames_dropped += len(self.frames)
+            self.frames.clear()
+            return True, frame
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=FRAME_WAIT_TIMEOUT)
+            self.thread = None
+
+# Decides which frames get the expensive detect/encode/match pass so the preview
+# holds its frame rate on slow hardware without hand tuning
+class FrameScheduler:
+    def __init__(self, target_preview_fps=TARGET_PREVIEW_FPS, max_latency=MAX_RECOGNITION_LATENCY,
+                 idle_after=IDLE_AFTER_SECONDS, idle_interval=IDLE_PROCESS_INTERVAL):
+        self.frame_period = 1.0 / target_preview_fps
+        self.max_latency = max_latency
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+        self.average_cost = 0.0
+        self.last_processed = None
+        self.last_face_seen = time.monotonic()
+
+    # Minimum gap between processing passes given the measured processing cost
+    def interval(self, now=None):
+        now = time.monotonic() if now is None else now
+
+        # Gap after a pass that keeps processing to PROCESSING_SHARE of wall time, so
+        # the preview gets the rest, but never longer than the recognition latency target
+        interval = self.average_cost * (1.0 / PROCESSING_SHARE - 1.0)
+        interval = min(max(interval, self.frame_period), self.max_latency)
+
+        # Nobody in view for a while: check less often until a face shows up again
+        if now - self.last_face_seen > self.idle_after:
+            interval = max(interval, self.idle_interval)
+        return interval
+
+    def should_process(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self.last_processed is None or now - self.last_processed >= self.interval(now)
+
+    # Feed back how long a processing pass took and whether it saw a face
+    def record(self, cost, face_seen, now=None):
+        now = time.monotonic() if now is None else now
+        self.last_processed = now
+        if self.average_cost == 0.0:
+            self.average_cost = cost
+        else:
+            self.average_cost += COST_SMOOTHING * (cost - self.average_cost)
+        if face_seen:
+            self.last_face_seen = now
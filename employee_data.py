@@ -0,0 +1,8 @@
+# File locations and layout of the employee records, shared by the kiosk and
+# the offline tools. Kept free of heavy imports so the kiosk can load it before
+# its background startup.
+
+# Global constants
+EMPLOYEE_DATA_FILE = 'employee_data.xlsx'  # For employee names, face crop paths and encoding IDs
+EMPLOYEE_DATA_HEADER = ["First Name", "Last Name", "ImagePath", "EncodingID", "FramePath"]
+IMAGE_DIR = 'employee_images/'
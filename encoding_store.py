@@ -0,0 +1,83 @@
+import json
+import os
+import numpy as np
+
+# Global constants
+ENCODING_SIZE = 128  # Length of a dlib face encoding
+ENCODING_DTYPE = np.float64  # dlib returns float64, so nothing is lost on disk
+ENCODINGS_FILE = 'face_encodings.bin'  # Raw (N, 128) matrix, one row per enrolment
+ENCODINGS_INDEX_FILE = 'face_encodings_index.jsonl'  # One {"id", "name", "model"} line per row
+ROW_BYTES = ENCODING_SIZE * np.dtype(ENCODING_DTYPE).itemsize
+
+# Complete index lines and the byte length they cover. A last line without its
+# newline was cut short by an interrupted append and is ignored.
+def read_index_lines(index_path=ENCODINGS_INDEX_FILE):
+    if not os.path.exists(index_path):
+        return [], 0
+
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    complete_size = data.rfind(b'\n') + 1
+    return [line for line in data[:complete_size].split(b'\n') if line.strip()], complete_size
+
+# Number of complete rows in the store
+def count_encodings(index_path=ENCODINGS_INDEX_FILE):
+    return len(read_index_lines(index_path)[0])
+
+# Every index entry, in row order
+def load_index(index_path=ENCODINGS_INDEX_FILE):
+    return [json.loads(line) for line in read_index_lines(index_path)[0]]
+
+# Memory-map the encoding matrix and read the name index; nothing is parsed or copied
+def load_encodings(encodings_path=ENCODINGS_FILE, index_path=ENCODINGS_INDEX_FILE):
+    entries = load_index(index_path)
+
+    stored_rows = os.path.getsize(encodings_path) // ROW_BYTES if os.path.exists(encodings_path) else 0
+
+    # A row only counts once both the matrix and the index have it (the index is written last)
+    count = min(len(entries), stored_rows)
+    if count == 0:
+        return np.zeros((0, ENCODING_SIZE), dtype=ENCODING_DTYPE), []
+
+    encodings = np.memmap(encodings_path, dtype=ENCODING_DTYPE, mode='r', shape=(count, ENCODING_SIZE))
+    return encodings, [entry['name'] for entry in entries[:count]]
+
+# Append encodings and their names; returns the IDs assigned to the new rows.
+# model_versions records what produced each row (see model_registry.model_version)
+# and sources the image it was encoded from (a list of images for a template
+# averaged over several shots); both are optional per-row lists.
+def append_encodings(encodings, names, encodings_path=ENCODINGS_FILE, index_path=ENCODINGS_INDEX_FILE,
+                     model_versions=None, sources=None):
+    block = np.ascontiguousarray(encodings, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+    if block.shape[0] != len(names):
+        raise ValueError("Number of encodings and names must match")
+
+    index_lines, complete_size = read_index_lines(index_path)
+    first_id = len(index_lines)
+
+    # Drop any half-written index line and matrix row left behind by an interrupted append
+    if os.path.exists(index_path) and os.path.getsize(index_path) > complete_size:
+        with open(index_path, 'r+b') as f:
+            f.truncate(complete_size)
+    if os.path.exists(encodings_path) and os.path.getsize(encodings_path) > first_id * ROW_BYTES:
+        with open(encodings_path, 'r+b') as f:
+            f.truncate(first_id * ROW_BYTES)
+
+    with open(encodings_path, 'ab') as f:
+        f.write(block.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    new_ids = list(range(first_id, first_id + len(names)))
+    with open(index_path, 'a', encoding='utf-8') as f:
+        for i, (encoding_id, name) in enumerate(zip(new_ids, names)):
+            entry = {"id": encoding_id, "name": name}
+            if model_versions is not None:
+                entry["model"] = model_versions[i]
+            if sources is not None:
+                entry["source"] = sources[i]
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    return new_ids
@@ -0,0 +1,103 @@
+import argparse
+import hashlib
+import os
+import cv2
+import model_registry as face_models
+from employee_data import EMPLOYEE_DATA_FILE, EMPLOYEE_DATA_HEADER, IMAGE_DIR
+
+# Global constants
+CROP_DIR = os.path.join(IMAGE_DIR, 'crops')  # crops/<first 2 hex digits>/<sha256>.jpg
+CROP_SIZE = int(os.environ.get("KIOSK_CROP_SIZE", "150"))  # Pixels; dlib's encoder works on 150x150 chips
+CROP_PADDING = 0.25  # Margin around the aligned face, as a fraction of the face size
+CROP_JPEG_QUALITY = int(os.environ.get("KIOSK_CROP_QUALITY", "90"))  # 0-100; lower is smaller
+KEEP_FULL_FRAME = os.environ.get("KIOSK_KEEP_FULL_FRAME", "0") == "1"  # Also keep the whole camera frame
+
+# Crops are stored under the hash of their JPEG bytes, so the same crop is only
+# ever written once and a path always refers to the same picture
+def crop_path(digest, crop_dir=CROP_DIR):
+    return os.path.join(crop_dir, digest[:2], digest + '.jpg')
+
+def is_crop_path(image_path, crop_dir=CROP_DIR):
+    return os.path.abspath(image_path).startswith(os.path.abspath(crop_dir) + os.sep)
+
+# Where the face sits inside a chip, as a (top, right, bottom, left) box, so a
+# stored crop can be re-encoded without running the detector again
+def crop_face_location(size=CROP_SIZE, padding=CROP_PADDING):
+    margin = int(round(size * padding / (1 + 2 * padding)))
+    return margin, size - margin, size - margin, margin
+
+# Write bytes to path via a temporary file so a reader never sees half a JPEG
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+# Save the aligned face from a BGR frame; returns the crop's path
+def save_face_crop(frame, face_location, crop_dir=CROP_DIR, size=CROP_SIZE, quality=CROP_JPEG_QUALITY):
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    chip = face_models.face_chip(rgb_frame, face_location, size, CROP_PADDING)
+    ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(chip, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode face crop")
+
+    data = encoded.tobytes()
+    path = crop_path(hashlib.sha256(data).hexdigest(), crop_dir)
+    if not os.path.exists(path):
+        write_atomically(path, data)
+    return path
+
+# Largest face in a stored photo, or None
+def largest_face(frame):
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    face_locations = face_models.face_locations(rgb_frame, model="hog")
+    if not face_locations:
+        return None
+    return max(face_locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+
+# One-off conversion of employee data Excel from full frames to face crops:
+# ImagePath becomes the crop and the original moves to the FramePath column
+def convert_employee_images(employee_data_path=EMPLOYEE_DATA_FILE, delete_frames=False):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(employee_data_path)
+    ws = wb.active
+    ws.cell(row=1, column=5).value = EMPLOYEE_DATA_HEADER[4]
+
+    converted = 0
+    saved_bytes = 0
+    for row in ws.iter_rows(min_row=2, max_col=5):
+        image_cell, frame_cell = row[2], row[4]
+        image_path = image_cell.value
+        if not image_path or is_crop_path(image_path) or not os.path.exists(image_path):
+            continue
+
+        frame = cv2.imread(image_path)
+        face_location = largest_face(frame) if frame is not None else None
+        if face_location is None:
+            print(f"Skipping {image_path}: no face found")
+            continue
+
+        image_cell.value = save_face_crop(frame, face_location)
+        saved_bytes += os.path.getsize(image_path) - os.path.getsize(image_cell.value)
+        if delete_frames:
+            os.remove(image_path)
+        else:
+            frame_cell.value = image_path
+        converted += 1
+
+    wb.save(employee_data_path)
+    print(f"Converted {converted} photos to face crops ({saved_bytes / 1024 / 1024:.1f} MiB less to read)")
+    return converted
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replace stored full-frame employee photos with aligned face crops.")
+    parser.add_argument("--employee-data", default=EMPLOYEE_DATA_FILE)
+    parser.add_argument("--delete-frames", action="store_true",
+                        help="Delete the full frames instead of keeping them in the FramePath column")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_employee_images(args.employee_data, args.delete_frames)
@@ -0,0 +1,77 @@
+import time
+import cv2
+import model_registry as face_models
+from stage_timing import record_stage
+
+# Global constants
+DETECTION_MODES = ("hog", "cascade", "cascade_roi")
+ROI_PADDING = 0.25  # Fraction of the cascade box added on each side before running HOG
+MIN_FACE_SIZE = 30  # Smallest face the cascade looks for, in full-resolution pixels
+
+# Convert Haar cascade (x, y, w, h) boxes to face_recognition's (top, right, bottom, left)
+def cascade_to_face_locations(faces):
+    return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in faces]
+
+# Run HOG only inside padded cascade boxes and map the hits back to frame coordinates
+def hog_in_cascade_rois(rgb_frame, faces, padding=ROI_PADDING):
+    frame_height, frame_width = rgb_frame.shape[:2]
+    face_locations = []
+
+    for (x, y, w, h) in faces:
+        pad_x = int(w * padding)
+        pad_y = int(h * padding)
+        left = max(int(x) - pad_x, 0)
+        top = max(int(y) - pad_y, 0)
+        right = min(int(x + w) + pad_x, frame_width)
+        bottom = min(int(y + h) + pad_y, frame_height)
+
+        roi = rgb_frame[top:bottom, left:right]
+        for (roi_top, roi_right, roi_bottom, roi_left) in face_models.face_locations(roi, model="hog"):
+            face_locations.append((roi_top + top, roi_right + left, roi_bottom + top, roi_left + left))
+
+    return face_locations
+
+# Turn the cascade result into the face locations face_encodings should use
+def locate_faces(rgb_frame, faces, mode="cascade_roi"):
+    if mode == "cascade":
+        return cascade_to_face_locations(faces)
+    if mode == "cascade_roi":
+        return hog_in_cascade_rois(rgb_frame, faces)
+    if mode == "hog":
+        return face_models.face_locations(rgb_frame, model="hog")
+    raise ValueError(f"Unknown detection mode: {mode}")
+
+# Shrink a frame for detection; scale 1.0 leaves it untouched
+def resize_for_detection(frame, scale):
+    if scale == 1.0:
+        return frame
+    return cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+# Map (top, right, bottom, left) boxes found on a resized frame back onto the full frame
+def scale_face_locations(face_locations, scale, frame_shape):
+    if scale == 1.0:
+        return list(face_locations)
+
+    frame_height, frame_width = frame_shape[:2]
+    return [(max(int(top / scale), 0), min(int(right / scale), frame_width),
+             min(int(bottom / scale), frame_height), max(int(left / scale), 0))
+            for (top, right, bottom, left) in face_locations]
+
+# Cascade + chosen locator on a downscaled copy of the BGR frame; boxes come back
+# in full-resolution coordinates ready for face_encodings
+def detect_faces(frame, face_cascade, mode="cascade_roi", scale=1.0, stage_times=None):
+    start = time.perf_counter()
+    small_frame = resize_for_detection(frame, scale)
+    gray_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+    min_size = max(int(MIN_FACE_SIZE * scale), 1)
+    faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+    record_stage(stage_times, "haar", start)
+
+    if len(faces) == 0:
+        return []
+
+    start = time.perf_counter()
+    small_rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB) if mode != "cascade" else None
+    face_locations = scale_face_locations(locate_faces(small_rgb_frame, faces, mode), scale, frame.shape)
+    record_stage(stage_times, "hog" if mode != "cascade" else "locate", start)
+    return face_locations
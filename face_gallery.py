@@ -0,0 +1,326 @@
+import os
+import numpy as np
+from encoding_store import ENCODING_SIZE, ENCODINGS_FILE, load_encodings
+
+# Global constants
+DEFAULT_TOLERANCE = 0.6  # Same threshold face_recognition.compare_faces uses
+DUPLICATE_TOLERANCE = 0.45  # Stricter than matching: closer than this is almost certainly the same face
+INITIAL_CAPACITY = 64
+ANN_MIN_GALLERY_SIZE = 5000  # Below this a brute-force scan is already fast enough
+ANN_DEFAULT_PROBES = 8  # Lists searched per probe; raise for recall, lower for speed
+KMEANS_ITERATIONS = 10
+GALLERY_INDEX_FILE = 'gallery_index.npz'  # ANN index built from the encoding store
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+RERANK_CANDIDATES = 32  # Quantized shortlist re-ranked with exact distances
+SCAN_CHUNK_ROWS = 4096  # Quantized rows decoded per block during a full scan
+INT8_DEFAULT_RANGE = 0.6  # Bound on dlib encoding values (the roster's reach about +/-0.55) until a scale is fitted
+INT8_FIT_MIN_ROWS = 100  # Fewer rows than this don't say enough about a dimension's range
+
+# Squared Euclidean distance between every row of a and every row of b
+def squared_distances(a, b, b_squared_norms=None):
+    if b_squared_norms is None:
+        b_squared_norms = np.einsum('ij,ij->i', b, b)
+    squared = b_squared_norms[None, :] - 2.0 * (a @ b.T)
+    squared += np.einsum('ij,ij->i', a, a)[:, None]
+    np.maximum(squared, 0.0, out=squared)
+    return squared
+
+# Inverted-file (IVF) index: k-means partitions the gallery into lists and a
+# probe only scans the rows of the n_probe lists whose centroids are closest
+class IVFIndex:
+    def __init__(self, centroids, lists, n_probe=ANN_DEFAULT_PROBES):
+        self.centroids = centroids
+        self.lists = lists
+        self.n_probe = n_probe
+        self.size = sum(len(l) for l in lists)
+
+    # Number of gallery rows covered by the index
+    def __len__(self):
+        return self.size
+
+    # Train centroids on the gallery rows with a few rounds of Lloyd's k-means
+    @classmethod
+    def build(cls, encodings, n_lists=None, n_probe=ANN_DEFAULT_PROBES, iterations=KMEANS_ITERATIONS, seed=0):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        count = encodings.shape[0]
+        if n_lists is None:
+            n_lists = int(np.sqrt(count))
+        n_lists = max(1, min(n_lists, count))
+
+        rng = np.random.default_rng(seed)
+        centroids = encodings[rng.choice(count, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmin(squared_distances(encodings, centroids), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, encodings)
+            sizes = np.bincount(assignments, minlength=n_lists)
+            filled = sizes > 0
+            # Empty lists keep their old centroid instead of collapsing to zero
+            centroids[filled] = sums[filled] / sizes[filled, None]
+
+        assignments = np.argmin(squared_distances(encodings, centroids), axis=1)
+        order = np.argsort(assignments, kind='stable')
+        boundaries = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        lists = [order[boundaries[i]:boundaries[i + 1]] for i in range(n_lists)]
+        return cls(centroids, lists, n_probe)
+
+    # Gallery row indices worth scanning exactly for one probe encoding
+    def candidates(self, probe, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, len(self.lists))
+        centroid_distances = squared_distances(probe[None, :], self.centroids)[0]
+        nearest = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+    # Written to a per-process temporary file and renamed into place, so a reader
+    # (or another process saving the same index) never sees a partial file
+    def save(self, path, source_mtime):
+        sizes = np.array([len(l) for l in self.lists], dtype=np.int64)
+        members = np.concatenate(self.lists) if self.lists else np.zeros(0, dtype=np.int64)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, sizes=sizes, members=members,
+                     n_probe=self.n_probe, source_mtime=source_mtime)
+        os.replace(temp_path, path)
+
+    # Load a saved index, or return None if it was built from an older roster or
+    # can't be read (truncated, corrupt, missing keys); the caller then rebuilds it
+    @classmethod
+    def load(cls, path, source_mtime):
+        try:
+            with np.load(path) as data:
+                if float(data['source_mtime']) != source_mtime:
+                    return None
+                boundaries = np.concatenate([[0], np.cumsum(data['sizes'])])
+                members = data['members']
+                lists = [members[boundaries[i]:boundaries[i + 1]] for i in range(len(data['sizes']))]
+                return cls(data['centroids'], lists, int(data['n_probe']))
+        except Exception:
+            return None
+
+# Holds every known face encoding in one preallocated matrix so a whole batch
+# of probe faces is matched with a single matrix multiply. With float16 or int8
+# storage the matrix is only used for a coarse scan and the best candidates are
+# re-ranked with exact float32 distances.
+class FaceGallery:
+    def __init__(self, capacity=INITIAL_CAPACITY, storage="float32"):
+        capacity = max(int(capacity), 1)
+        self.storage = storage
+        self.encodings = np.zeros((capacity, ENCODING_SIZE), dtype=STORAGE_DTYPES[storage])
+        # Per-dimension int8 step size; the fixed bound until enough rows are seen to fit one
+        self.scale = np.full(ENCODING_SIZE, INT8_DEFAULT_RANGE / 127.0, dtype=np.float32)
+        # Squared norms are precomputed so ||a - b||^2 = ||a||^2 + ||b||^2 - 2a.b
+        self.squared_norms = np.zeros(capacity, dtype=np.float32)
+        self.names = []
+        self.count = 0
+        self.index = None  # Optional IVFIndex; None means exact brute-force search
+        # Exact rows for re-ranking quantized matches: a (memory-mapped) array for
+        # the first rows, then any rows added after the gallery was built
+        self.exact_source = None
+        self.recent_exact = {}
+
+    def __len__(self):
+        return self.count
+
+    # Build a gallery from the encodings and names in the encoding store. For
+    # quantized storage, pass the memory-mapped store as exact_source so exact
+    # vectors are only paged in for the rows being re-ranked.
+    @classmethod
+    def from_encodings(cls, encodings, names, storage="float32", exact_source=None):
+        gallery = cls(capacity=len(names), storage=storage)
+        if storage == "int8":
+            gallery._fit_scale(encodings)
+        if storage != "float32":
+            gallery.exact_source = exact_source
+        if len(names):
+            gallery.add_many(encodings, names)
+        return gallery
+
+    # Bytes held in memory for the encodings themselves
+    def memory_bytes(self):
+        return self.encodings[:self.count].nbytes + self.squared_norms[:self.count].nbytes
+
+    # Grow the preallocated matrix by doubling so appends stay cheap
+    def _reserve(self, needed):
+        capacity = self.encodings.shape[0]
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        encodings = np.zeros((capacity, ENCODING_SIZE), dtype=self.encodings.dtype)
+        encodings[:self.count] = self.encodings[:self.count]
+        squared_norms = np.zeros(capacity, dtype=np.float32)
+        squared_norms[:self.count] = self.squared_norms[:self.count]
+        self.encodings = encodings
+        self.squared_norms = squared_norms
+
+    # Symmetric per-dimension int8 scale so each dimension uses the full int8
+    # range. The scale stays fixed as rows are added, so a later row outside the
+    # fitted range is clipped in the coarse scan (the exact re-rank is unaffected)
+    # until build_index refits it.
+    def _fit_scale(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) < INT8_FIT_MIN_ROWS:
+            self.scale = np.full(ENCODING_SIZE, INT8_DEFAULT_RANGE / 127.0, dtype=np.float32)
+        else:
+            self.scale = np.maximum(np.abs(encodings).max(axis=0) / 127.0, 1e-8).astype(np.float32)
+
+    # float32 encodings -> storage dtype
+    def _quantize(self, block):
+        if self.storage == "int8":
+            return np.clip(np.rint(block / self.scale), -127, 127).astype(np.int8)
+        return block.astype(self.encodings.dtype, copy=False)
+
+    # Stored rows (a slice or index array) back to float32
+    def _dequantize(self, rows):
+        block = self.encodings[rows]
+        if self.storage == "int8":
+            return block.astype(np.float32) * self.scale
+        return block.astype(np.float32, copy=False)
+
+    # Exact float32 vectors for re-ranking
+    def _exact(self, rows):
+        if self.storage == "float32":
+            return self.encodings[rows]
+
+        exact = np.empty((len(rows), ENCODING_SIZE), dtype=np.float32)
+        source_rows = len(self.exact_source) if self.exact_source is not None else 0
+        in_source = rows < source_rows
+        if in_source.any():
+            exact[in_source] = self.exact_source[rows[in_source]]
+        for i in np.nonzero(~in_source)[0]:
+            exact[i] = self.recent_exact[rows[i]]
+        return exact
+
+    # Amortised O(1) append; an existing index keeps working and the new row is
+    # scanned exactly until the next rebuild
+    def add(self, encoding, name):
+        self.add_many([encoding], [name])
+
+    def add_many(self, encodings, names):
+        block = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if block.shape[0] != len(names):
+            raise ValueError("Number of encodings and names must match")
+
+        start = self.count
+        end = start + block.shape[0]
+        self._reserve(end)
+        self.encodings[start:end] = self._quantize(block)
+        self.squared_norms[start:end] = np.einsum('ij,ij->i', block, block)
+
+        # Quantized galleries keep exact copies of rows the exact source doesn't cover
+        if self.storage != "float32":
+            source_rows = len(self.exact_source) if self.exact_source is not None else 0
+            for row in range(max(start, source_rows), end):
+                self.recent_exact[row] = block[row - start].copy()
+
+        self.names.extend(names)
+        self.count = end
+
+    # Partition the gallery with an IVF index; matching then only scans a shortlist
+    def build_index(self, n_lists=None, n_probe=ANN_DEFAULT_PROBES):
+        # Refit the int8 scale to every row now held, so rows added since the
+        # gallery was built are no longer clipped
+        if self.storage == "int8" and self.count:
+            exact = self._exact(np.arange(self.count))
+            self._fit_scale(exact)
+            self.encodings[:self.count] = self._quantize(exact)
+        self.index = IVFIndex.build(self._dequantize(slice(0, self.count)), n_lists, n_probe)
+        return self.index
+
+    # Euclidean distance from every probe face to every known face, shape (M, N);
+    # approximate for quantized storage, which is decoded a chunk at a time
+    def distances(self, probe_encodings):
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if self.storage == "float32":
+            squared = squared_distances(probes, self.encodings[:self.count], self.squared_norms[:self.count])
+            return np.sqrt(squared, out=squared)
+
+        # Fold the int8 scale into the probes once instead of into every stored row
+        scaled_probes = probes * self.scale if self.storage == "int8" else probes
+        squared = np.empty((probes.shape[0], self.count), dtype=np.float32)
+        for start in range(0, self.count, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, self.count)
+            block = self.encodings[start:end].astype(np.float32)
+            squared[:, start:end] = self.squared_norms[start:end][None, :] - 2.0 * (scaled_probes @ block.T)
+        squared += np.einsum('ij,ij->i', probes, probes)[:, None]
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    # Pick the top_k closest rows of one probe's distance vector, closest first
+    def _top_k(self, face_distances, rows, top_k, tolerance):
+        top_k = min(top_k, len(rows))
+        if top_k == 1:
+            best = np.argmin(face_distances)[None]
+        else:
+            # argpartition keeps this O(N) before sorting only k items
+            best = np.argpartition(face_distances, top_k - 1)[:top_k]
+            best = best[np.argsort(face_distances[best])]
+
+        return [(self.names[rows[i]], float(face_distances[i])) for i in best if face_distances[i] <= tolerance]
+
+    # Final ranking for one probe; quantized distances only pick the shortlist
+    # that is then re-ranked with exact float32 distances
+    def _rank(self, probe, face_distances, rows, top_k, tolerance):
+        if self.storage == "float32":
+            return self._top_k(face_distances, rows, top_k, tolerance)
+
+        shortlist_size = min(max(top_k, RERANK_CANDIDATES), len(rows))
+        shortlist = rows[np.argpartition(face_distances, shortlist_size - 1)[:shortlist_size]]
+        squared = squared_distances(probe[None, :], self._exact(shortlist), self.squared_norms[shortlist])[0]
+        return self._top_k(np.sqrt(squared), shortlist, top_k, tolerance)
+
+    # Match a batch of probe faces and return, for each one, the top_k
+    # (name, distance) pairs that are within tolerance, closest first
+    def match(self, probe_encodings, top_k=1, tolerance=DEFAULT_TOLERANCE, n_probe=None):
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if self.count == 0 or probes.shape[0] == 0:
+            return [[] for _ in range(probes.shape[0])]
+
+        if self.index is None:
+            all_rows = np.arange(self.count)
+            return [self._rank(probe, face_distances, all_rows, top_k, tolerance)
+                    for probe, face_distances in zip(probes, self.distances(probes))]
+
+        # Rows added since the index was built are always scanned, so new hires
+        # match straight away without an index rebuild
+        unindexed_rows = np.arange(len(self.index), self.count)
+
+        # Approximate shortlist from the index, then exact re-ranking of just those rows
+        results = []
+        for probe in probes:
+            rows = self.index.candidates(probe, n_probe)
+            if len(unindexed_rows):
+                rows = np.concatenate([rows, unindexed_rows])
+            if len(rows) == 0:
+                results.append([])
+                continue
+            squared = squared_distances(probe[None, :], self._dequantize(rows), self.squared_norms[rows])[0]
+            results.append(self._rank(probe, np.sqrt(squared), rows, top_k, tolerance))
+        return results
+
+    # Convenience for the common case: best name for each probe, or None
+    def best_names(self, probe_encodings, tolerance=DEFAULT_TOLERANCE):
+        return [matches[0][0] if matches else None for matches in self.match(probe_encodings, 1, tolerance)]
+
+# Build the matcher gallery from the encoding store, with an ANN index for large
+# rosters and optional float16/int8 storage
+def load_gallery(n_probe=ANN_DEFAULT_PROBES, index_path=GALLERY_INDEX_FILE, storage="float32"):
+    known_face_encodings, known_face_names = load_encodings()
+    gallery = FaceGallery.from_encodings(known_face_encodings, known_face_names, storage,
+                                         exact_source=known_face_encodings)
+
+    if len(gallery) >= ANN_MIN_GALLERY_SIZE:
+        # Reuse the saved index unless the encoding store has changed since it was built
+        source_mtime = os.path.getmtime(ENCODINGS_FILE)
+        gallery.index = IVFIndex.load(index_path, source_mtime)
+
+        if gallery.index is None or len(gallery.index) != len(gallery):
+            gallery.build_index()
+            gallery.index.save(index_path, source_mtime)
+
+        gallery.index.n_probe = n_probe
+
+    return gallery
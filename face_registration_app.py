@@ -1,141 +1,370 @@
-import cv2
-import face_recognition
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox
-from openpyxl import Workbook, load_workbook
 import datetime
-import numpy as np
 import time
+from concurrent.futures import ThreadPoolExecutor
+from attendance_log import ACTION_COLUMNS, ATTENDANCE_DB, EXCEL_FILE, open_attendance_log
+from camera_pipeline import FrameGrabber, FrameScheduler
+from employee_data import EMPLOYEE_DATA_FILE, EMPLOYEE_DATA_HEADER, IMAGE_DIR
+from face_tracker import FaceTracker
+from stage_timing import metrics
+import model_registry as face_models
+
+# cv2, numpy, openpyxl and the modules built on them are imported by
+# load_runtime on a background thread so the window appears straight away;
+# dlib models are only loaded when model_registry first needs them
+cv2 = np = None
+Workbook = load_workbook = None
 
 # Global constants
-EXCEL_FILE = 'attendance.xlsx'  # For daily attendance
-EMPLOYEE_DATA_FILE = 'employee_data.xlsx'  # For face encodings and image paths
-IMAGE_DIR = 'employee_images/'
+ANN_PROBES = 8  # Index lists scanned per face; higher = better recall, slower match
+GALLERY_STORAGE = os.environ.get("KIOSK_GALLERY_STORAGE", "float32")  # "float16"/"int8" cut gallery memory 2x/4x
+# "cascade_roi" runs HOG inside Haar boxes, so boxes match those the gallery was
+# enrolled with; "cascade" encodes raw Haar boxes (faster, accuracy not yet
+# benchmarked against the gallery); "hog" is full-frame HOG
+DETECTION_MODE = os.environ.get("KIOSK_DETECTION_MODE", "cascade_roi")
+DETECTION_SCALE = float(os.environ.get("KIOSK_DETECTION_SCALE", "0.5"))  # Detect on a resized frame, encode at full size
+KIOSK_MODE = os.environ.get("KIOSK_MODE", "1") == "1"  # Keep the camera open between punches
+AUTO_ACTION = "Auto"  # Punch whichever of the day's actions comes next for the employee
+SHOW_DEBUG_OVERLAY = os.environ.get("KIOSK_DEBUG_OVERLAY", "0") == "1"  # Stage timings drawn on the preview
+
+# Gallery kept in memory between camera sessions, with the file stats it was built from
+gallery_cache = {"key": None, "gallery": None}
+
+# Attendance event log, opened at startup; attendance.xlsx is only an export of it
+attendance = {"log": None}
+
+# Background startup state, polled by check_startup
+startup = {"done": threading.Event(), "error": None}
+
+# Registration disk writes run here, one at a time and in order, off the UI thread
+registration_writer = ThreadPoolExecutor(max_workers=1)
+
+# Camera, capture thread and cascade kept warm for the life of the process in kiosk mode
+kiosk = {"cap": None, "grabber": None, "face_cascade": None}
 
 if not os.path.exists(IMAGE_DIR):
     os.makedirs(IMAGE_DIR)
 
-# Set the path to the face recognition models
-def set_face_recognition_model_path():
-    model_path = "C:\\Users\\user\\Desktop\\BSc\\final year project\\artefact\\face_recognition_models"
-    if os.path.exists(model_path):
-        os.environ["FACE_RECOGNITION_MODEL_PATH"] = model_path
-    else:
-        messagebox.showerror("Error", "Face recognition model path does not exist.")
+# Import the heavy modules; runs once, off the UI thread
+def load_runtime():
+    global cv2, np, Workbook, load_workbook
+    global load_gallery, DUPLICATE_TOLERANCE, recognize_faces, collect_enrollment_shots, average_encodings
+    global consistent_shots
+    global ENCODINGS_FILE, ENCODINGS_INDEX_FILE, load_index, append_encodings
+    global save_face_crop, KEEP_FULL_FRAME
+
+    import cv2
+    import numpy as np
+    from openpyxl import Workbook, load_workbook
+    from face_gallery import load_gallery, DUPLICATE_TOLERANCE
+    from recognition_pipeline import recognize_faces, collect_enrollment_shots, average_encodings, consistent_shots
+    from encoding_store import ENCODINGS_FILE, ENCODINGS_INDEX_FILE, load_index, append_encodings
+    from face_crop_store import save_face_crop, KEEP_FULL_FRAME
+
+# Run every model once on dummy input so the first real punch doesn't pay for
+# lazy initialisation inside dlib and OpenCV
+def warm_up_models():
+    dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    get_face_cascade().detectMultiScale(dummy_frame[:, :, 0])
+    face_encodings = face_models.face_encodings(dummy_frame, [(100, 300, 300, 100)])
+    get_cached_gallery().match(face_encodings)
+
+# Everything slow at startup: imports, workbooks, gallery, camera and model warm-up
+def run_startup():
+    try:
+        load_runtime()
+
+        # Open the attendance log and initialise the employee data Excel file
+        init_attendance_log()
+        init_employee_data_excel()
+
+        # Load the gallery once at startup so the first punch doesn't pay for it
+        get_cached_gallery()
+
+        # Kiosk mode: open the camera now and keep it warm until the window closes
+        if KIOSK_MODE:
+            acquire_camera()
+        warm_up_models()
+    except Exception as error:
+        startup["error"] = error
+    finally:
+        startup["done"].set()
+
+# Poll from the UI thread until background startup has finished, then enable the buttons
+def check_startup():
+    if not startup["done"].is_set():
+        app.after(100, check_startup)
+        return
 
-# Initialise Excel with a new sheet for each day
-def init_attendance_excel():
-    if not os.path.exists(EXCEL_FILE):
-        wb = Workbook()
-        wb.save(EXCEL_FILE)
-    
-    wb = load_workbook(EXCEL_FILE)
-    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
-    
-    if current_date not in wb.sheetnames:
-        ws = wb.create_sheet(current_date)
-        ws.append(["Employee Name", "Shift Start", "Break Start", "Break End", "Shift End"])
-        wb.save(EXCEL_FILE)
-
-# Initialise employee data Excel (face encodings and image paths)
+    if startup["error"] is not None:
+        status_label.config(text="Startup failed")
+        messagebox.showerror("Error", f"Failed to start: {startup['error']}")
+        return
+
+    status_label.config(text="Ready")
+    for button in startup_buttons:
+        button.config(state=tk.NORMAL)
+
+# Check the face recognition models can be found (FACE_RECOGNITION_MODEL_PATH,
+# the installed face_recognition_models package or the bundled copy)
+def set_face_recognition_model_path():
+    try:
+        face_models.validate_models()
+    except FileNotFoundError as error:
+        messagebox.showerror("Error", str(error))
+
+# Open the attendance log; the first run imports the existing attendance workbook.
+# Today's employee index is built here so the first punch doesn't pay for it.
+def init_attendance_log():
+    attendance["log"] = open_attendance_log(ATTENDANCE_DB, EXCEL_FILE)
+    attendance["log"].load_day(datetime.datetime.now().strftime('%Y-%m-%d'))
+
+# Initialise employee data Excel (names, image paths and encoding IDs)
 def init_employee_data_excel():
     if not os.path.exists(EMPLOYEE_DATA_FILE):
         wb = Workbook()
         ws = wb.active
         ws.title = "EmployeeData"
-        ws.append(["First Name", "Last Name", "ImagePath", "FaceEncoding"])
+        ws.append(EMPLOYEE_DATA_HEADER)
         wb.save(EMPLOYEE_DATA_FILE)
 
-# Optimise camera handling for recognition
-def open_camera_for_recognition(action_type):
+    migrate_encodings_to_store()
+
+# One-off move of stringified encodings from employee_data.xlsx into the binary
+# store. The "EncodingID" header marks it done, so a run whose Excel save failed
+# (e.g. the file was open in Excel) is finished on the next start.
+def migrate_encodings_to_store():
+    wb = load_workbook(EMPLOYEE_DATA_FILE)
+    ws = wb.active
+    if ws.cell(row=1, column=4).value == EMPLOYEE_DATA_HEADER[3]:
+        return
+
+    encodings = []
+    names = []
+    cells = []
+    for row in ws.iter_rows(min_row=2, max_col=4):
+        first_name, last_name, _, face_encoding = (cell.value for cell in row)
+        if isinstance(face_encoding, str) and face_encoding.startswith('['):
+            encodings.append(np.fromstring(face_encoding[1:-1], dtype=float, sep=','))
+            names.append(f"{first_name} {last_name}")
+            cells.append(row[3])
+
+    # An earlier run may have written the store but not the Excel file
+    if encodings and [entry['name'] for entry in load_index()[:len(names)]] == names:
+        encoding_ids = list(range(len(names)))
+    elif encodings:
+        encoding_ids = append_encodings(encodings, names)
+    else:
+        encoding_ids = []
+
+    # The Excel file keeps only the store row ID from now on
+    for cell, encoding_id in zip(cells, encoding_ids):
+        cell.value = encoding_id
+    ws.cell(row=1, column=4).value = EMPLOYEE_DATA_HEADER[3]
+    wb.save(EMPLOYEE_DATA_FILE)
+
+# Open the camera at the recognition resolution and start its capture thread
+def open_camera():
     cap = cv2.VideoCapture(0)
 
     if not cap.isOpened():
-        messagebox.showerror("Error", "Cannot access camera. Please check your device.")
-        return
+        return None, None
 
     # Set lower resolution for faster performance
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
-    # Load known face encodings and names
-    known_face_encodings, known_face_names = load_registered_faces()
+    # Capture on a background thread so each pass works on the freshest frame
+    return cap, FrameGrabber(cap).start()
 
-    if not known_face_encodings:
-        messagebox.showerror("Error", "No registered faces found. Please register employees first.")
+# Hand out the camera; in kiosk mode the same warm camera is reused every time
+def acquire_camera():
+    if not KIOSK_MODE:
+        return open_camera()
+
+    if kiosk["grabber"] is None or not kiosk["grabber"].running:
+        release_camera(kiosk["cap"], kiosk["grabber"], force=True)
+        kiosk["cap"], kiosk["grabber"] = open_camera()
+    return kiosk["cap"], kiosk["grabber"]
+
+# Close the camera, unless it is the kiosk's warm camera
+def release_camera(cap, grabber, force=False):
+    if KIOSK_MODE and not force and cap is kiosk["cap"]:
+        return
+
+    if grabber is not None:
+        grabber.stop()
+    if cap is not None:
         cap.release()
+    if cap is kiosk["cap"]:
+        kiosk["cap"], kiosk["grabber"] = None, None
+
+# Build the Haar cascade once per process
+def get_face_cascade():
+    if kiosk["face_cascade"] is None:
+        kiosk["face_cascade"] = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return kiosk["face_cascade"]
+
+# Optimise camera handling for recognition; in group mode everyone recognised
+# in the frame is punched together
+def open_camera_for_recognition(action_type, group=False):
+    cap, grabber = acquire_camera()
+
+    if cap is None:
+        messagebox.showerror("Error", "Cannot access camera. Please check your device.")
         return
 
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    # Known face encodings and names, reloaded only if the roster has changed
+    gallery = get_cached_gallery()
+
+    if not len(gallery):
+        messagebox.showerror("Error", "No registered faces found. Please register employees first.")
+        release_camera(cap, grabber)
+        return
+
+    face_cascade = get_face_cascade()
     face_found = False
-    process_frame = True  # Skip every alternate frame
+    scheduler = FrameScheduler()  # Skips frames based on measured processing cost
+    tracker = FaceTracker()  # Encodes each face once per track instead of every pass
 
     while True:
-        ret, frame = cap.read()
+        ret, frame = grabber.read()
 
         if not ret:
             messagebox.showerror("Error", "Failed to capture image from camera.")
             break
 
-        if process_frame:
-            process_frame = False
+        if scheduler.should_process():
+            process_start = time.perf_counter()
 
-            # Convert to grayscale for faster Haar Cascade detection
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+            stage_times = {}
+            tracks = recognize_faces(frame, face_cascade, gallery, tracker, DETECTION_MODE, DETECTION_SCALE,
+                                     tolerance=0.6, stage_times=stage_times)
+            metrics.observe_all(stage_times)
 
-            if len(faces) > 0:
-                # Convert to RGB for face recognition
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_frame, model="hog")
-                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            identified = [track for track in tracks if track.name is not None and not track.punched]
 
-                for face_encoding, face_location in zip(face_encodings, face_locations):
-                    matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-                    face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
+            if identified and group:
+                # One ledger transaction and one summary for the whole group
+                for track in identified:
+                    track.mark_punched()
+                face_found = True
+                record_group_punches([track.name for track in identified], action_type)
 
-                    if True in matches:
-                        best_match_index = np.argmin(face_distances)
-                        employee_name = known_face_names[best_match_index]
-                        face_found = True
-                        update_employee_action(employee_name, action_type)
-                        messagebox.showinfo("Success", f"{action_type} recorded for {employee_name}")
-                        break
+            elif identified:
+                track = identified[0]
+                employee_name = track.name
+                track.mark_punched()
+                face_found = True
+                recorded_action = update_employee_action(employee_name, action_type)
+                if recorded_action:
+                    messagebox.showinfo("Success", f"{recorded_action} recorded for {employee_name}")
 
-        else:
-            process_frame = True
+            scheduler.record(time.perf_counter() - process_start, bool(tracks))
+            metrics.maybe_write()
 
         if face_found or cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+        if SHOW_DEBUG_OVERLAY:
+            draw_metrics_overlay(frame)
         cv2.imshow('Live Recognition', frame)
 
-    cap.release()
+    release_camera(cap, grabber)
     cv2.destroyAllWindows()
+    metrics.write()
 
     if not face_found:
         messagebox.showerror("No Match", "No face match found!")
 
-# Load registered faces for recognition
-def load_registered_faces():
-    known_face_encodings = []
-    known_face_names = []
-
+# Draw the latest per-stage timings in the corner of the preview frame
+def draw_metrics_overlay(frame):
+    for i, line in enumerate(metrics.overlay_lines()):
+        cv2.putText(frame, line, (10, 20 + 18 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+# Punch every recognised employee in one workbook save and show one summary dialog
+def record_group_punches(employee_names, action_type):
+    employee_names = list(dict.fromkeys(employee_names))  # Same person twice in a frame punches once
+    results = update_employee_actions([(employee_name, action_type) for employee_name in employee_names])
+
+    summary = []
+    for employee_name, (recorded_action, _, message) in zip(employee_names, results):
+        summary.append(f"{recorded_action} recorded for {employee_name}" if recorded_action else message)
+    messagebox.showinfo("Punch Summary", "\n".join(summary))
+
+# Identify the current roster by the size and mtime of the encoding store files
+def gallery_cache_key():
+    key = []
+    for path in (ENCODINGS_FILE, ENCODINGS_INDEX_FILE):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            key.append((stat.st_mtime_ns, stat.st_size))
+        else:
+            key.append(None)
+    return tuple(key)
+
+# Return the in-memory gallery, rebuilding it only when the store files change
+def get_cached_gallery():
+    key = gallery_cache_key()
+    if gallery_cache["gallery"] is None or gallery_cache["key"] != key:
+        gallery_cache["gallery"] = load_gallery(ANN_PROBES, storage=GALLERY_STORAGE)
+        gallery_cache["key"] = key
+    return gallery_cache["gallery"]
+
+# Write a registration to disk: a face crop per shot (plus the first full frame
+# if configured), encoding store and employee data Excel. The store lists every
+# shot's crop as the row's sources so rebuild_gallery can re-average them.
+def save_registration(first_name, last_name, frames, face_locations, face_encoding, gallery):
+    crop_paths = [save_face_crop(frame, face_location) for frame, face_location in zip(frames, face_locations)]
+    image_path = crop_paths[0]
+    frame = frames[0]
+    frame_path = None
+    if KEEP_FULL_FRAME:
+        frame_filename = f"{first_name}_{last_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
+        frame_path = os.path.join(IMAGE_DIR, frame_filename)
+        cv2.imwrite(frame_path, frame)
+
+    # Save the encoding to the binary store and the metadata to employee data Excel
+    encoding_id = append_encodings([face_encoding], [f"{first_name} {last_name}"],
+                                   model_versions=[face_models.model_version()], sources=[crop_paths])[0]
     wb = load_workbook(EMPLOYEE_DATA_FILE)
     ws = wb.active
-
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        first_name, last_name, _, face_encoding = row
-        full_name = f"{first_name} {last_name}"
-
-        if face_encoding:
-            encoding = np.fromstring(face_encoding[1:-1], dtype=float, sep=',')
-            known_face_encodings.append(encoding)
-            known_face_names.append(full_name)
-
-    return known_face_encodings, known_face_names
+    ws.cell(row=1, column=5).value = EMPLOYEE_DATA_HEADER[4]  # Older files only have four columns
+    ws.append([first_name, last_name, image_path, encoding_id, frame_path])
+    wb.save(EMPLOYEE_DATA_FILE)
+
+    # The live gallery already has this row, so don't let the new file stats force a reload
+    if gallery_cache["gallery"] is gallery:
+        gallery_cache["key"] = gallery_cache_key()
+
+# Surface a failed background registration write on the UI thread
+def report_registration_error(future):
+    error = future.exception()
+    if error is not None:
+        app.after(0, lambda: messagebox.showerror("Error", f"Failed to save registration: {error}"))
+
+# Live preview while enrolment shots are being collected
+def show_registration_preview(frame):
+    cv2.imshow('Registration', frame)
+    cv2.waitKey(1)
+
+# Warn before enrolling a face that is already in the gallery, under this
+# name or another one; returns True if registration should go ahead
+def confirm_not_duplicate(gallery, face_encoding, full_name):
+    matches = gallery.match([face_encoding], top_k=3, tolerance=DUPLICATE_TOLERANCE)[0]
+    if not matches:
+        return True
+
+    existing = "\n".join(f"{name} (distance {distance:.2f})" for name, distance in matches)
+    if any(name == full_name for name, _ in matches):
+        prompt = f"{full_name} is already registered:\n{existing}\n\nRegister another copy anyway?"
+    else:
+        prompt = f"This face closely matches an existing employee:\n{existing}\n\nRegister as {full_name} anyway?"
+    return messagebox.askyesno("Possible Duplicate", prompt, icon=messagebox.WARNING)
 
 # Register a new employee
 def register_new_employee():
@@ -146,90 +375,114 @@ def register_new_employee():
         messagebox.showerror("Error", "Please enter both first and last names")
         return
 
-    cap = cv2.VideoCapture(0)
+    cap, grabber = acquire_camera()
 
-    while True:
-        ret, frame = cap.read()
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-
-        if face_locations:
-            face_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
-            image_filename = f"{first_name}_{last_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-            image_path = os.path.join(IMAGE_DIR, image_filename)
-            cv2.imwrite(image_path, frame)
-
-            # Save to employee data Excel
-            wb = load_workbook(EMPLOYEE_DATA_FILE)
-            ws = wb.active
-            ws.append([first_name, last_name, image_path, str(face_encoding.tolist())])
-            wb.save(EMPLOYEE_DATA_FILE)
-
-            messagebox.showinfo("Success", f"Face registered for {first_name} {last_name}")
+    if cap is None:
+        messagebox.showerror("Error", "Cannot access camera. Please check your device.")
+        return
+
+    # Several good shots within a fixed time budget; the cascade gates the encoder
+    shot_encodings, shot_frames, shot_locations = collect_enrollment_shots(
+        grabber.read, get_face_cascade(), DETECTION_MODE, DETECTION_SCALE, on_frame=show_registration_preview)
+
+    if not shot_encodings:
+        messagebox.showerror("Error", "No clear face found. Please face the camera and try again.")
+    else:
+        face_encoding = average_encodings(shot_encodings)
+        gallery = get_cached_gallery()
+
+        # Keep the shots that went into the template, so it can be rebuilt from them
+        used = consistent_shots(shot_encodings)
+        shot_frames = [frame for frame, keep in zip(shot_frames, used) if keep]
+        shot_locations = [location for location, keep in zip(shot_locations, used) if keep]
+
+        if confirm_not_duplicate(gallery, face_encoding, f"{first_name} {last_name}"):
+            # New hire is recognisable straight away; the files are written in the background
+            gallery.add(face_encoding, f"{first_name} {last_name}")
+            future = registration_writer.submit(save_registration, first_name, last_name, shot_frames,
+                                                shot_locations, face_encoding, gallery)
+            future.add_done_callback(report_registration_error)
+
+            messagebox.showinfo("Success", f"Face registered for {first_name} {last_name} "
+                                           f"from {len(shot_encodings)} shots")
             first_name_entry.delete(0, tk.END)
             last_name_entry.delete(0, tk.END)
-            break
 
-    cap.release()
+    release_camera(cap, grabber)
     cv2.destroyAllWindows()
 
-from openpyxl import Workbook, load_workbook
-
-# Update employee action (clock-in, break start, etc.)
+# Message shown when an action has already been recorded for the day
+ALREADY_RECORDED = {
+    "Clock In": ("Already Clocked In", "{} has already clocked in today."),
+    "Break Start": ("Already Started Break", "{} has already started break today."),
+    "Break End": ("Already Ended Break", "{} has already ended break today."),
+    "Shift End": ("Already Clocked Out", "{} has already ended their shift today."),
+}
+
+# Decide one action against what the employee has already recorded today
+# ({action: timestamp}, updated in place); returns (recorded action or None,
+# rejection title, message)
+def apply_employee_action(recorded, full_name, action_type, timestamp):
+    # In auto mode the next action not yet recorded today decides the action
+    if action_type == AUTO_ACTION:
+        action_type = next((action for action, _ in ACTION_COLUMNS if action not in recorded), "Shift End")
+
+    if action_type in recorded:
+        title, message = ALREADY_RECORDED[action_type]
+        return None, title, message.format(full_name)
+
+    recorded[action_type] = timestamp
+    return action_type, None, None
+
+# Update employee action (clock-in, break start, etc.); returns the action recorded, or None
 def update_employee_action(full_name, action_type):
-    wb = load_workbook(EXCEL_FILE)
-    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
-
-    # Check if today's date already has a sheet; if not, create it
-    if current_date not in wb.sheetnames:
-        ws = wb.create_sheet(current_date)
-        ws.append(["Employee Name", "Shift Start", "Break Start", "Break End", "Shift End"])
-    else:
-        ws = wb[current_date]
-
-    # Check if the employee already has an entry in today's sheet
-    employee_row = None
-    for row in ws.iter_rows(min_row=2, max_col=1, values_only=False):
-        if row[0].value == full_name:
-            employee_row = row
-            break
-
-    # If employee doesn't have an entry, add a new row
-    if not employee_row:
-        ws.append([full_name, None, None, None, None])
-        row_index = ws.max_row
-    else:
-        row_index = employee_row[0].row
-
-    # Update the appropriate column based on the action type
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    if action_type == "Clock In":
-        if ws.cell(row=row_index, column=2).value is None:
-            ws.cell(row=row_index, column=2).value = timestamp
-        else:
-            messagebox.showinfo("Already Clocked In", f"{full_name} has already clocked in today.")
-            return
-    elif action_type == "Break Start":
-        if ws.cell(row=row_index, column=3).value is None:
-            ws.cell(row=row_index, column=3).value = timestamp
-        else:
-            messagebox.showinfo("Already Started Break", f"{full_name} has already started break today.")
-            return
-    elif action_type == "Break End":
-        if ws.cell(row=row_index, column=4).value is None:
-            ws.cell(row=row_index, column=4).value = timestamp
-        else:
-            messagebox.showinfo("Already Ended Break", f"{full_name} has already ended break today.")
-            return
-    elif action_type == "Shift End":
-        if ws.cell(row=row_index, column=5).value is None:
-            ws.cell(row=row_index, column=5).value = timestamp
-        else:
-            messagebox.showinfo("Already Clocked Out", f"{full_name} has already ended their shift today.")
-            return
-    # Save the workbook
-    wb.save(EXCEL_FILE)
+    recorded_action, title, message = update_employee_actions([(full_name, action_type)])[0]
+    if recorded_action is None:
+        messagebox.showinfo(title, message)
+    return recorded_action
+
+# Record several punches as one append to the attendance log; returns one
+# (recorded action or None, rejection title, message) per punch
+def update_employee_actions(punches):
+    with metrics.timer("attendance_write"):
+        now = datetime.datetime.now()
+        current_date = now.strftime('%Y-%m-%d')
+        timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
+
+        recorded = {}
+        results = []
+        new_punches = []
+        for full_name, action_type in punches:
+            if full_name not in recorded:
+                recorded[full_name] = attendance["log"].employee_actions(current_date, full_name)
+            result = apply_employee_action(recorded[full_name], full_name, action_type, timestamp)
+            if result[0] is not None:
+                new_punches.append((current_date, full_name, result[0], timestamp))
+            results.append(result)
+
+        if new_punches:
+            attendance["log"].append(new_punches)
+    return results
+
+# Write attendance.xlsx from the log on a background thread
+def export_attendance():
+    def run_export():
+        try:
+            attendance["log"].export_workbook(EXCEL_FILE)
+            app.after(0, lambda: messagebox.showinfo("Export", f"Attendance exported to {EXCEL_FILE}"))
+        except Exception as error:
+            message = f"Failed to export attendance: {error}"
+            app.after(0, lambda: messagebox.showerror("Error", message))
+
+    threading.Thread(target=run_export, name="AttendanceExport", daemon=True).start()
+
+# Release the warm kiosk camera when the window is closed
+def shutdown():
+    release_camera(kiosk["cap"], kiosk["grabber"], force=True)
+    registration_writer.shutdown(wait=True)  # Finish any registration still being written
+    if attendance["log"] is not None:
+        attendance["log"].close()
+    app.destroy()
 
 # Tkinter GUI Setup
 app = tk.Tk()
@@ -238,11 +491,23 @@ app.title("Employee Attendance System")
 # Set the path to the face recognition models before starting the app
 set_face_recognition_model_path()
 
-# Main menu buttons
-tk.Button(app, text="Clock In", command=lambda: open_camera_for_recognition("Clock In")).pack(pady=10)
-tk.Button(app, text="Break Start", command=lambda: open_camera_for_recognition("Break Start")).pack(pady=10)
-tk.Button(app, text="Break End", command=lambda: open_camera_for_recognition("Break End")).pack(pady=10)
-tk.Button(app, text="Shift End", command=lambda: open_camera_for_recognition("Shift End")).pack(pady=10)
+# Shown until models, gallery and camera have loaded in the background
+status_label = tk.Label(app, text="Loading face recognition models...")
+status_label.pack(pady=5)
+
+# Main menu buttons; disabled until startup has finished
+group_punch = tk.BooleanVar(value=False)
+startup_buttons = [
+    tk.Button(app, text="Punch (Auto)", command=lambda: open_camera_for_recognition(AUTO_ACTION, group_punch.get())),
+    tk.Button(app, text="Clock In", command=lambda: open_camera_for_recognition("Clock In", group_punch.get())),
+    tk.Button(app, text="Break Start", command=lambda: open_camera_for_recognition("Break Start", group_punch.get())),
+    tk.Button(app, text="Break End", command=lambda: open_camera_for_recognition("Break End", group_punch.get())),
+    tk.Button(app, text="Shift End", command=lambda: open_camera_for_recognition("Shift End", group_punch.get())),
+]
+for button in startup_buttons:
+    button.config(state=tk.DISABLED)
+    button.pack(pady=10)
+tk.Checkbutton(app, text="Group punch (everyone in view)", variable=group_punch).pack(pady=5)
 
 # New Employee Registration
 tk.Label(app, text="First Name:").pack(pady=5)
@@ -253,10 +518,17 @@ tk.Label(app, text="Last Name:").pack(pady=5)
 last_name_entry = tk.Entry(app)
 last_name_entry.pack(pady=5)
 
-tk.Button(app, text="Register New Employee", command=register_new_employee).pack(pady=20)
+register_button = tk.Button(app, text="Register New Employee", command=register_new_employee, state=tk.DISABLED)
+register_button.pack(pady=20)
+startup_buttons.append(register_button)
+
+export_button = tk.Button(app, text="Export Attendance to Excel", command=export_attendance, state=tk.DISABLED)
+export_button.pack(pady=5)
+startup_buttons.append(export_button)
 
-# Initialize Excel files
-init_attendance_excel()
-init_employee_data_excel()
+# Load models, workbooks, gallery and camera in the background while the window is up
+threading.Thread(target=run_startup, name="Startup", daemon=True).start()
+app.after(100, check_startup)
+app.protocol("WM_DELETE_WINDOW", shutdown)
 
 app.mainloop()
@@ -0,0 +1,126 @@
+import itertools
+
+# Global constants
+IOU_THRESHOLD = 0.3  # Minimum box overlap to continue a track
+CENTROID_THRESHOLD = 0.5  # Or centre shift under this fraction of the box width
+MAX_MISSED_FRAMES = 10  # Detection passes a track survives without being seen
+REENCODE_INTERVAL = 15  # Detection passes before an identified track is re-checked
+UNKNOWN_RETRY_INTERVAL = 3  # Detection passes between retries for an unmatched track
+MAX_FAILED_RECHECKS = 2  # Re-checks in a row that find no match before a track drops its name
+
+# Overlap of two (top, right, bottom, left) boxes as intersection over union
+def box_iou(a, b):
+    top = max(a[0], b[0])
+    right = min(a[1], b[1])
+    bottom = min(a[2], b[2])
+    left = max(a[3], b[3])
+    intersection = max(right - left, 0) * max(bottom - top, 0)
+    if intersection == 0:
+        return 0.0
+
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+# Distance between box centres relative to the width of box a
+def centroid_shift(a, b):
+    a_x, a_y = (a[1] + a[3]) / 2.0, (a[0] + a[2]) / 2.0
+    b_x, b_y = (b[1] + b[3]) / 2.0, (b[0] + b[2]) / 2.0
+    width = max(a[1] - a[3], 1)
+    return ((a_x - b_x) ** 2 + (a_y - b_y) ** 2) ** 0.5 / width
+
+class Track:
+    def __init__(self, track_id, location, frame_index):
+        self.track_id = track_id
+        self.location = location
+        self.name = None
+        self.distance = None
+        self.last_seen = frame_index
+        self.last_encoded = None
+        self.failed_rechecks = 0
+        self.punched = False  # Set by the caller once this track's punch is recorded
+        self.punched_name = None  # Identity the punch was recorded for
+
+    def mark_punched(self):
+        self.punched = True
+        self.punched_name = self.name
+
+# Follows faces across detection passes so each person is encoded once per
+# track (or every REENCODE_INTERVAL passes) instead of on every frame
+class FaceTracker:
+    def __init__(self, reencode_interval=REENCODE_INTERVAL, max_missed=MAX_MISSED_FRAMES):
+        self.reencode_interval = reencode_interval
+        self.max_missed = max_missed
+        self.tracks = {}
+        self.frame_index = 0
+        self.next_id = itertools.count(1)
+
+    # Associate this pass's face locations with existing tracks (greedy, best
+    # overlap first) and return the tracks that are visible now, in input order
+    def update(self, face_locations):
+        self.frame_index += 1
+
+        pairs = []
+        for detection_index, location in enumerate(face_locations):
+            for track in self.tracks.values():
+                iou = box_iou(track.location, location)
+                if iou >= IOU_THRESHOLD or centroid_shift(track.location, location) <= CENTROID_THRESHOLD:
+                    pairs.append((iou, -centroid_shift(track.location, location), detection_index, track.track_id))
+        pairs.sort(reverse=True)
+
+        assigned = {}
+        used_tracks = set()
+        for _, _, detection_index, track_id in pairs:
+            if detection_index in assigned or track_id in used_tracks:
+                continue
+            assigned[detection_index] = self.tracks[track_id]
+            used_tracks.add(track_id)
+
+        visible = []
+        for detection_index, location in enumerate(face_locations):
+            track = assigned.get(detection_index)
+            if track is None:
+                track = Track(next(self.next_id), location, self.frame_index)
+                self.tracks[track.track_id] = track
+            elif self.frame_index - track.last_seen > 1:
+                # The face was out of sight, so whoever is here now may be someone
+                # else; drop the name and encode again before trusting it
+                track.name = track.distance = None
+                track.last_encoded = None
+            track.location = location
+            track.last_seen = self.frame_index
+            visible.append(track)
+
+        # Forget faces that have left the frame
+        for track_id in [t.track_id for t in self.tracks.values() if self.frame_index - t.last_seen > self.max_missed]:
+            del self.tracks[track_id]
+
+        return visible
+
+    # Whether a visible track needs a fresh encoding this pass
+    def needs_encoding(self, track):
+        if track.last_encoded is None:
+            return True
+        confirmed = track.name is not None and track.failed_rechecks == 0
+        interval = self.reencode_interval if confirmed else UNKNOWN_RETRY_INTERVAL
+        return self.frame_index - track.last_encoded >= interval
+
+    # Record the match result for a freshly encoded track. One failed re-check
+    # is retried soon; MAX_FAILED_RECHECKS in a row clear the name, since
+    # someone else may have stepped into the track.
+    def set_identity(self, track, name, distance=None):
+        track.last_encoded = self.frame_index
+        if name is None:
+            if track.name is not None:
+                track.failed_rechecks += 1
+                if track.failed_rechecks >= MAX_FAILED_RECHECKS:
+                    track.name = track.distance = None
+                    track.failed_rechecks = 0
+            return
+
+        # Losing and regaining the same name doesn't allow a second punch
+        track.failed_rechecks = 0
+        if name != track.punched_name:
+            track.punched = False
+        track.name = name
+        track.distance = distance
@@ -0,0 +1,95 @@
+import argparse
+import csv
+import os
+import numpy as np
+from openpyxl import load_workbook
+from employee_data import EMPLOYEE_DATA_FILE
+from encoding_store import load_encodings
+from face_gallery import DUPLICATE_TOLERANCE, squared_distances
+
+# Global constants
+SCAN_CHUNK_ROWS = 512  # Probe rows compared with the whole store per block
+REPORT_COLUMNS = ["Cluster", "EncodingID", "Employee Name", "ImagePath", "Nearest Distance"]
+
+# EncodingID -> ImagePath from employee data Excel, for the report
+def load_image_paths(employee_data_path=EMPLOYEE_DATA_FILE):
+    if not os.path.exists(employee_data_path):
+        return {}
+
+    wb = load_workbook(employee_data_path, read_only=True)
+    image_paths = {}
+    for _, _, image_path, encoding_id in wb.active.iter_rows(min_row=2, max_col=4, values_only=True):
+        if isinstance(encoding_id, int):
+            image_paths[encoding_id] = image_path
+    wb.close()
+    return image_paths
+
+# Union-find root with path halving
+def find_root(parents, row):
+    while parents[row] != row:
+        parents[row] = parents[parents[row]]
+        row = parents[row]
+    return row
+
+# Group store rows whose encodings are within tolerance of each other. Each
+# block of rows is compared with every later row in one matrix product, so
+# the whole store is scanned once. Returns (clusters, nearest distance per row).
+def find_duplicate_clusters(encodings, tolerance=DUPLICATE_TOLERANCE):
+    encodings = np.asarray(encodings, dtype=np.float32)
+    squared_norms = np.einsum('ij,ij->i', encodings, encodings)
+    parents = list(range(len(encodings)))
+    nearest = np.full(len(encodings), np.inf, dtype=np.float32)
+
+    for start in range(0, len(encodings), SCAN_CHUNK_ROWS):
+        end = min(start + SCAN_CHUNK_ROWS, len(encodings))
+        distances = np.sqrt(squared_distances(encodings[start:end], encodings[start:], squared_norms[start:]))
+
+        # Only pairs (i, j) with j > i, so every pair is seen once
+        distances[np.tril_indices(end - start, m=distances.shape[1])] = np.inf
+        for i, j in zip(*np.nonzero(distances <= tolerance)):
+            row, other = start + i, start + j
+            nearest[row] = min(nearest[row], distances[i, j])
+            nearest[other] = min(nearest[other], distances[i, j])
+            parents[find_root(parents, row)] = find_root(parents, other)
+
+    groups = {}
+    for row in range(len(encodings)):
+        groups.setdefault(find_root(parents, row), []).append(row)
+    clusters = sorted((rows for rows in groups.values() if len(rows) > 1), key=lambda rows: (-len(rows), rows[0]))
+    return clusters, nearest
+
+def report_duplicates(args):
+    encodings, names = load_encodings()
+    image_paths = load_image_paths(args.employee_data)
+    clusters, nearest = find_duplicate_clusters(encodings, args.tolerance)
+
+    report_rows = []
+    for cluster_number, rows in enumerate(clusters, 1):
+        cluster_names = sorted({names[row] for row in rows})
+        kind = "same name" if len(cluster_names) == 1 else "DIFFERENT NAMES"
+        print(f"Cluster {cluster_number}: {len(rows)} encodings, {kind}")
+        for row in rows:
+            print(f"  #{row} {names[row]} {image_paths.get(row, '')} (nearest {nearest[row]:.3f})")
+            report_rows.append([cluster_number, row, names[row], image_paths.get(row, ''), f"{nearest[row]:.4f}"])
+
+    duplicate_rows = sum(len(rows) - 1 for rows in clusters)
+    print(f"{len(encodings)} encodings scanned, {len(clusters)} duplicate clusters, "
+          f"{duplicate_rows} encodings could be removed")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(report_rows)
+    return clusters
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report faces enrolled more than once in the encoding store.")
+    parser.add_argument("--tolerance", type=float, default=DUPLICATE_TOLERANCE,
+                        help="Encodings closer than this are treated as the same face")
+    parser.add_argument("--employee-data", default=EMPLOYEE_DATA_FILE, help="Employee data Excel, for image paths")
+    parser.add_argument("--csv", help="Also write the clusters to this CSV file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    report_duplicates(parse_args())
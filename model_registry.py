@@ -0,0 +1,120 @@
+import os
+import threading
+from importlib import resources
+
+# Global constants
+MODEL_FILES = {
+    "pose_68": "shape_predictor_68_face_landmarks.dat",  # 68-point landmarks, ~100 MB
+    "pose_5": "shape_predictor_5_face_landmarks.dat",  # 5-point landmarks, ~9 MB
+    "encoder": "dlib_face_recognition_resnet_model_v1.dat",  # 128-d face encoder
+    "cnn_detector": "mmod_human_face_detector.dat",  # CNN face detector, only for model="cnn"
+}
+# Landmark model used to align faces before encoding: "pose_68" matches the
+# encodings face_recognition produced by default, "pose_5" loads much faster
+LANDMARK_MODEL = os.environ.get("FACE_LANDMARK_MODEL", "pose_68")
+BUNDLED_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "face_recognition_models", "face_recognition_models", "models")
+
+# Resolved paths and loaded dlib objects, shared by the whole process
+model_paths = {}
+loaded_models = {}
+models_lock = threading.Lock()
+
+# Directories searched for .dat files: FACE_RECOGNITION_MODEL_PATH (either the
+# models folder itself or a face_recognition_models checkout), the installed
+# face_recognition_models package, then the copy bundled with this repo
+def model_directories():
+    directories = []
+
+    configured = os.environ.get("FACE_RECOGNITION_MODEL_PATH")
+    if configured:
+        directories += [configured, os.path.join(configured, "models"),
+                        os.path.join(configured, "face_recognition_models", "models")]
+
+    try:
+        directories.append(str(resources.files("face_recognition_models") / "models"))
+    except (ImportError, AttributeError, TypeError):
+        pass
+
+    directories.append(BUNDLED_MODEL_DIR)
+    return directories
+
+# Find and validate a model file once; later calls return the cached path
+def locate_model(name):
+    if name in model_paths:
+        return model_paths[name]
+
+    filename = MODEL_FILES[name]
+    for directory in model_directories():
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            model_paths[name] = path
+            return path
+
+    raise FileNotFoundError(f"Face recognition model {filename} not found. "
+                            f"Set FACE_RECOGNITION_MODEL_PATH to the folder that contains it.")
+
+# Check the models the app needs are present, without loading them
+def validate_models(names=None):
+    for name in names or [LANDMARK_MODEL, "encoder"]:
+        locate_model(name)
+
+# Load a dlib model once per process; only the models actually used are ever loaded
+def get_model(name):
+    with models_lock:
+        if name not in loaded_models:
+            import dlib
+
+            if name == "hog_detector":
+                loaded_models[name] = dlib.get_frontal_face_detector()
+            elif name == "encoder":
+                loaded_models[name] = dlib.face_recognition_model_v1(locate_model(name))
+            elif name == "cnn_detector":
+                loaded_models[name] = dlib.cnn_face_detection_model_v1(locate_model(name))
+            else:
+                loaded_models[name] = dlib.shape_predictor(locate_model(name))
+        return loaded_models[name]
+
+# Same contract as face_recognition.face_locations: (top, right, bottom, left) boxes
+def face_locations(rgb_image, number_of_times_to_upsample=1, model="hog"):
+    height, width = rgb_image.shape[:2]
+
+    if model == "cnn":
+        rects = [d.rect for d in get_model("cnn_detector")(rgb_image, number_of_times_to_upsample)]
+    else:
+        rects = get_model("hog_detector")(rgb_image, number_of_times_to_upsample)
+
+    return [(max(r.top(), 0), min(r.right(), width), min(r.bottom(), height), max(r.left(), 0)) for r in rects]
+
+# Same contract as face_recognition.face_encodings: one 128-d array per face
+def face_encodings(rgb_image, known_face_locations=None, num_jitters=1, landmark_model=None):
+    import dlib
+    import numpy as np
+
+    if known_face_locations is None:
+        known_face_locations = face_locations(rgb_image)
+
+    pose_predictor = get_model(landmark_model or LANDMARK_MODEL)
+    encoder = get_model("encoder")
+
+    encodings = []
+    for top, right, bottom, left in known_face_locations:
+        landmarks = pose_predictor(rgb_image, dlib.rectangle(int(left), int(top), int(right), int(bottom)))
+        encodings.append(np.array(encoder.compute_face_descriptor(rgb_image, landmarks, num_jitters)))
+    return encodings
+
+# Aligned face thumbnail (RGB): the face is rotated upright and scaled so the
+# landmarks land in the same place in every chip, as dlib's encoder expects
+def face_chip(rgb_image, face_location, size=150, padding=0.25, landmark_model=None):
+    import dlib
+
+    top, right, bottom, left = face_location
+    landmarks = get_model(landmark_model or LANDMARK_MODEL)(
+        rgb_image, dlib.rectangle(int(left), int(top), int(right), int(bottom)))
+    return dlib.get_face_chip(rgb_image, landmarks, size=size, padding=padding)
+
+# Identifies the models and settings behind an encoding; encodings with different
+# versions aren't comparable, so this is stored with every row
+def model_version(landmark_model=None, num_jitters=1):
+    landmark_file = MODEL_FILES[landmark_model or LANDMARK_MODEL]
+    return f"{os.path.splitext(landmark_file)[0]}+{os.path.splitext(MODEL_FILES['encoder'])[0]}+jitters{num_jitters}"
@@ -0,0 +1,218 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import time
+import cv2
+import model_registry as face_models
+from openpyxl import load_workbook
+from employee_data import EMPLOYEE_DATA_FILE
+from encoding_store import ENCODINGS_FILE, ENCODINGS_INDEX_FILE, append_encodings, load_encodings, load_index
+from face_crop_store import crop_face_location, is_crop_path, largest_face
+from recognition_pipeline import average_encodings
+
+# Global constants
+REBUILD_SUFFIX = '.rebuild'  # New store files are written next to the live ones, then swapped in
+BACKUP_SUFFIX = '.bak'
+WRITE_BATCH_SIZE = 64  # Encodings appended (and fsynced) per write; the unit of resume
+PROGRESS_INTERVAL = 5.0  # Seconds between progress lines
+
+# Settings for the current rebuild, set once per worker process
+worker = {}
+
+def init_worker(landmark_model, num_jitters):
+    worker["landmark_model"] = landmark_model
+    worker["num_jitters"] = num_jitters
+
+# Re-encode one stored image, or None. Aligned crops already have the face in
+# a known place, so only full frames need the detector.
+def encode_image(source):
+    frame = cv2.imread(source) if source and os.path.exists(source) else None
+    if frame is None:
+        return None
+
+    if is_crop_path(source):
+        face_location = crop_face_location(frame.shape[0])
+    else:
+        face_location = largest_face(frame)
+        if face_location is None:
+            return None
+
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return face_models.face_encodings(rgb_frame, [face_location], worker["num_jitters"],
+                                      worker["landmark_model"])[0]
+
+# Re-encode one row's source, or each shot of a multi-shot enrolment averaged
+# the way registration did. Returns (row number, encoding or None, shots that
+# could not be re-encoded). Runs in a worker process.
+def encode_job(job):
+    row_number, source = job
+    shots = source if isinstance(source, list) else [source]
+    encodings = [encoding for encoding in map(encode_image, shots) if encoding is not None]
+    if not encodings:
+        return row_number, None, len(shots)
+    return row_number, average_encodings(encodings), len(shots) - len(encodings)
+
+# One (row number, name, image(s) to encode, old EncodingID) per employee data
+# row. Rows enrolled from several shots list every shot's crop as their source
+# in the store, and those are re-encoded together. With from_frames the full
+# frame is used where one was kept, e.g. after changing the detector or the
+# crop alignment.
+def load_jobs(employee_data_path, from_frames):
+    old_sources = [entry.get("source") for entry in load_index()]
+    wb = load_workbook(employee_data_path, read_only=True)
+    jobs = []
+    for row_number, row in enumerate(wb.active.iter_rows(min_row=2, max_col=5, values_only=True), 2):
+        first_name, last_name, image_path, encoding_id, frame_path = (tuple(row) + (None,) * 5)[:5]
+        if first_name is None and last_name is None:
+            continue
+        shots = old_sources[encoding_id] if isinstance(encoding_id, int) and encoding_id < len(old_sources) else None
+        multi_shot = isinstance(shots, list) and len(shots) > 1 and image_path in shots
+        if from_frames and frame_path:
+            source = frame_path
+            if multi_shot:
+                print(f"Row {row_number} ({first_name} {last_name}): template was averaged over "
+                      f"{len(shots)} shots, rebuilding it from the one full frame kept")
+        else:
+            source = shots if multi_shot else image_path
+        jobs.append((row_number, f"{first_name} {last_name}", source, encoding_id))
+    wb.close()
+    return jobs
+
+# Rows already written by an interrupted rebuild, provided it was made from
+# the same images with the same models; otherwise start again
+def resume_point(jobs, version, encodings_path, index_path):
+    version_path = index_path + '.model'
+    if os.path.exists(version_path):
+        with open(version_path, 'r', encoding='utf-8') as f:
+            same_version = f.read().strip() == version
+        entries = load_index(index_path)
+        done = min(len(entries), len(load_encodings(encodings_path, index_path)[1]))
+        sources = [source for _, _, source, _ in jobs]
+        if same_version and done <= len(jobs) and all(entry.get("source") == source
+                                                      for entry, source in zip(entries[:done], sources)):
+            return done
+
+    for path in (encodings_path, index_path):
+        if os.path.exists(path):
+            os.remove(path)
+    with open(version_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    return 0
+
+# Re-encode jobs[start:] into the rebuild store, in order, with progress
+def encode_jobs(jobs, start, args, version, encodings_path, index_path):
+    old_encodings, _ = load_encodings()
+    old_versions = [entry.get("model") for entry in load_index()]
+    remaining = jobs[start:]
+    pending = []
+    failed = 0
+    started = last_report = time.perf_counter()
+
+    with multiprocessing.Pool(args.workers, init_worker, (args.landmark_model, args.num_jitters)) as pool:
+        results = pool.imap(encode_job, [(row_number, source) for row_number, _, source, _ in remaining], chunksize=4)
+        for done, (row_number, face_encoding, missing_shots) in enumerate(results, 1):
+            _, name, source, old_id = remaining[done - 1]
+            if face_encoding is not None and missing_shots:
+                print(f"Row {row_number} ({name}): {missing_shots} of {len(source)} shots could not be "
+                      f"re-encoded, averaging the rest")
+
+            # Keep the old encoding, with its old model version, rather than lose the employee
+            if face_encoding is None:
+                failed += 1
+                if not isinstance(old_id, int) or old_id >= len(old_encodings):
+                    raise RuntimeError(f"Row {row_number} ({name}): cannot re-encode {source} "
+                                       f"and there is no old encoding to keep")
+                print(f"Row {row_number} ({name}): cannot re-encode {source}, keeping the old encoding")
+                pending.append((old_encodings[old_id], name, old_versions[old_id], source))
+            else:
+                pending.append((face_encoding, name, version, source))
+
+            # Written in order and fsynced a batch at a time, so an interrupted run resumes here
+            if len(pending) >= WRITE_BATCH_SIZE or done == len(remaining):
+                encodings, names, versions, sources = zip(*pending)
+                append_encodings(list(encodings), list(names), encodings_path, index_path, list(versions), list(sources))
+                pending = []
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL or done == len(remaining):
+                rate = done / max(now - started, 1e-9)
+                print(f"Encoded {start + done}/{len(jobs)} ({rate:.1f} images/s, "
+                      f"{(len(remaining) - done) / max(rate, 1e-9):.0f}s left)")
+                last_report = now
+    return failed
+
+# Swap the rebuilt store and the renumbered employee data in, keeping the old
+# files as backups. Each file is replaced with an atomic rename. The kiosk must
+# be stopped first: on Windows a file it has memory-mapped (float16/int8
+# storage) cannot be replaced. If any rename fails, the files already swapped
+# are moved back so the live store stays consistent, and the rebuilt files are
+# kept so the next run swaps them in without re-encoding.
+def swap_in(jobs, employee_data_path, encodings_path, index_path):
+    wb = load_workbook(employee_data_path)
+    ws = wb.active
+    for encoding_id, (row_number, _, _, _) in enumerate(jobs):
+        ws.cell(row=row_number, column=4).value = encoding_id
+    temp_employee_data = employee_data_path + REBUILD_SUFFIX + '.xlsx'
+    wb.save(temp_employee_data)
+
+    for live_path in (ENCODINGS_FILE, ENCODINGS_INDEX_FILE, employee_data_path):
+        if os.path.exists(live_path):
+            shutil.copy2(live_path, live_path + BACKUP_SUFFIX)
+
+    swapped = []
+    try:
+        for new_path, live_path in ((encodings_path, ENCODINGS_FILE), (index_path, ENCODINGS_INDEX_FILE),
+                                    (temp_employee_data, employee_data_path)):
+            os.replace(new_path, live_path)
+            swapped.append((new_path, live_path))
+    except OSError as error:
+        for new_path, live_path in reversed(swapped):
+            os.replace(live_path, new_path)
+            if os.path.exists(live_path + BACKUP_SUFFIX):
+                shutil.copy2(live_path + BACKUP_SUFFIX, live_path)
+        raise RuntimeError(f"Could not swap in the rebuilt gallery ({error}); the old files are still live. "
+                           f"Stop the kiosk (it keeps {ENCODINGS_FILE} open) and run again to finish the swap"
+                           ) from error
+    os.remove(index_path + '.model')
+
+def rebuild_gallery(args):
+    version = face_models.model_version(args.landmark_model, args.num_jitters)
+    encodings_path = ENCODINGS_FILE + REBUILD_SUFFIX
+    index_path = ENCODINGS_INDEX_FILE + REBUILD_SUFFIX
+    print(f"Rebuilding encodings with {version}")
+
+    jobs = load_jobs(args.employee_data, args.from_frames)
+    if not jobs:
+        print("No employees to re-encode")
+        return 0
+
+    # Registrations made during the rebuild are appended to employee data, so
+    # keep going until every row has been encoded
+    failed = 0
+    while True:
+        start = resume_point(jobs, version, encodings_path, index_path)
+        if start == len(jobs):
+            break
+        if start:
+            print(f"Resuming after {start} encoded rows")
+        failed += encode_jobs(jobs, start, args, version, encodings_path, index_path)
+        jobs = load_jobs(args.employee_data, args.from_frames)
+
+    swap_in(jobs, args.employee_data, encodings_path, index_path)
+    print(f"Swapped in {len(jobs)} encodings ({failed} kept from the old gallery); "
+          f"old files kept with a {BACKUP_SUFFIX} suffix")
+    return len(jobs)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-encode every stored employee image and swap in the new gallery. "
+                                                 "Stop the kiosk before the swap.")
+    parser.add_argument("--employee-data", default=EMPLOYEE_DATA_FILE)
+    parser.add_argument("--landmark-model", default=face_models.LANDMARK_MODEL, choices=["pose_68", "pose_5"])
+    parser.add_argument("--num-jitters", type=int, default=1, help="Re-sampled encodings averaged per face")
+    parser.add_argument("--from-frames", action="store_true", help="Encode the full frames where they were kept")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    rebuild_gallery(parse_args())
@@ -0,0 +1,96 @@
+import time
+import cv2
+import model_registry as face_models
+import numpy as np
+from face_detection import detect_faces
+from face_tracker import FaceTracker
+from stage_timing import record_stage
+
+# Global constants
+DEFAULT_TOLERANCE = 0.6
+ENROLL_SHOTS = 5  # Good frames wanted per enrolment
+ENROLL_TIME_BUDGET = 6.0  # Seconds before enrolment gives up or settles for fewer shots
+ENROLL_MIN_SHOT_GAP = 0.2  # Seconds between shots so they aren't near-identical frames
+ENROLL_MIN_FACE_SIZE = 80  # Pixels; smaller faces give poor encodings
+ENROLL_OUTLIER_DISTANCE = 0.35  # Shots further than this from the mean are dropped
+
+# One detection -> encoding -> matching pass over a BGR frame. Faces are
+# followed by the tracker so only new or stale tracks are re-encoded; pass
+# tracker=None to treat every face as new. Returns the visible tracks.
+def recognize_faces(frame, face_cascade, gallery, tracker=None, detection_mode="cascade_roi", detection_scale=1.0,
+                    tolerance=DEFAULT_TOLERANCE, stage_times=None):
+    if tracker is None:
+        tracker = FaceTracker()
+
+    # Detect on a downscaled frame; boxes come back in full-resolution coordinates.
+    # detect_faces records its own haar and hog/locate stages.
+    face_locations = detect_faces(frame, face_cascade, detection_mode, detection_scale, stage_times)
+
+    tracks = tracker.update(face_locations)
+    tracks_to_encode = [track for track in tracks if tracker.needs_encoding(track)]
+
+    if tracks_to_encode:
+        # Convert to RGB for face recognition
+        start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_encodings = face_models.face_encodings(rgb_frame, [track.location for track in tracks_to_encode])
+        record_stage(stage_times, "encode", start)
+
+        # Match every new or stale track against the gallery in one pass
+        start = time.perf_counter()
+        for track, matches in zip(tracks_to_encode, gallery.match(face_encodings, tolerance=tolerance)):
+            tracker.set_identity(track, *(matches[0] if matches else (None, None)))
+        record_stage(stage_times, "match", start)
+
+    return tracks
+
+# Collect up to `shots` encodings of a single face within `time_budget` seconds.
+# The Haar cascade runs on every frame and the dlib encoder only runs on frames
+# with exactly one large enough face. Returns (encodings, frames, face
+# locations), one of each per shot.
+def collect_enrollment_shots(read_frame, face_cascade, detection_mode="cascade_roi", detection_scale=1.0,
+                             shots=ENROLL_SHOTS, time_budget=ENROLL_TIME_BUDGET, on_frame=None):
+    encodings = []
+    frames = []
+    locations = []
+    deadline = time.monotonic() + time_budget
+    last_shot = 0.0
+
+    while len(encodings) < shots and time.monotonic() < deadline:
+        ret, frame = read_frame()
+        if not ret:
+            break
+
+        if on_frame is not None:
+            on_frame(frame)
+
+        now = time.monotonic()
+        if now - last_shot < ENROLL_MIN_SHOT_GAP:
+            continue
+
+        face_locations = detect_faces(frame, face_cascade, detection_mode, detection_scale)
+        if len(face_locations) != 1:
+            continue
+
+        top, right, bottom, left = face_locations[0]
+        if min(bottom - top, right - left) < ENROLL_MIN_FACE_SIZE:
+            continue
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        encodings.extend(face_models.face_encodings(rgb_frame, face_locations))
+        last_shot = now
+        frames.append(frame)
+        locations.append(face_locations[0])
+
+    return encodings, frames, locations
+
+# Which shots agree with the rest; if none do, all of them are used
+def consistent_shots(encodings):
+    encodings = np.asarray(encodings, dtype=np.float64)
+    consistent = np.linalg.norm(encodings - encodings.mean(axis=0), axis=1) <= ENROLL_OUTLIER_DISTANCE
+    return consistent if consistent.any() else np.ones(len(encodings), dtype=bool)
+
+# Average the shots into one template, ignoring any that disagree with the rest
+def average_encodings(encodings):
+    encodings = np.asarray(encodings, dtype=np.float64)
+    return encodings[consistent_shots(encodings)].mean(axis=0)
@@ -0,0 +1,102 @@
+import collections
+import contextlib
+import os
+import threading
+import time
+
+# Global constants
+METRICS_FILE = 'recognition_metrics.prom'  # Prometheus text format, rewritten every flush
+METRICS_FLUSH_INTERVAL = 10.0  # Seconds between metrics file rewrites
+HISTOGRAM_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+RECENT_SAMPLES = 100  # Samples kept per stage for the on-screen overlay
+
+# Add the time spent since start to a per-call stage total, if the caller is collecting them
+def record_stage(stage_times, stage, start):
+    if stage_times is not None:
+        stage_times[stage] = stage_times.get(stage, 0.0) + time.perf_counter() - start
+
+# Cumulative latency histogram for one stage, plus a short window of recent samples
+class StageHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(HISTOGRAM_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent = collections.deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    # Percentile over the recent window, for the overlay
+    def recent_percentile(self, percentile):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(len(ordered) * percentile / 100.0), len(ordered) - 1)]
+
+# Process-wide per-stage timings: camera read, Haar, HOG/locate, encoding,
+# matching and the attendance write all report here
+class StageMetrics:
+    def __init__(self):
+        self.histograms = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = StageHistogram()
+            self.histograms[stage].observe(seconds)
+
+    # Feed a per-call stage_times dict (see record_stage) into the histograms
+    def observe_all(self, stage_times):
+        for stage, seconds in stage_times.items():
+            self.observe(stage, seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    # One short line per stage for the preview window
+    def overlay_lines(self):
+        with self.lock:
+            return [f"{stage}: {1000 * h.recent[-1]:.1f}ms p95 {1000 * h.recent_percentile(95):.1f}ms"
+                    for stage, h in self.histograms.items() if h.recent]
+
+    # Render every histogram in Prometheus text exposition format
+    def prometheus_text(self):
+        lines = ["# HELP recognition_stage_seconds Time spent in each recognition stage.",
+                 "# TYPE recognition_stage_seconds histogram"]
+        with self.lock:
+            for stage, h in self.histograms.items():
+                cumulative = 0
+                for bound, bucket_count in zip(HISTOGRAM_BUCKETS, h.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'recognition_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'recognition_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'recognition_stage_seconds_sum{{stage="{stage}"}} {h.total:.6f}')
+                lines.append(f'recognition_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    # Rewrite the metrics file atomically so a scraper never sees a partial file
+    def write(self, path=METRICS_FILE):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+        self.last_flush = time.monotonic()
+
+    def maybe_write(self, path=METRICS_FILE, interval=METRICS_FLUSH_INTERVAL):
+        if time.monotonic() - self.last_flush >= interval:
+            self.write(path)
+
+metrics = StageMetrics()